@@ -15,117 +15,220 @@ DynamoDB Table Structure:
 - Table Name: academic_records
 - Partition Key: record_id (String) - Format: {school_id}#{academic_year}#{grade}#{section}#{subject_id}
 - Sort Key: topic_id (String)
-- GSI1: parent_phone (String) - For querying by parent
-- GSI2: teacher_id (String) - For querying by teacher
-- GSI3: school_id (String) - For querying by school
+- GSI1: teacher_id (String) - For querying by teacher
+- GSI2: school_id (String) - For querying by school
+- GSI3: topic_id (String) - For querying by topic
+- GSI4: class_id (String) - Format: {school_id}#{academic_year}#{grade}#{section} - For querying by class
 """
 
 import json
 import boto3
-import uuid
-from datetime import datetime
-from decimal import Decimal
+from boto3.dynamodb.transform import TransformationInjector
+from boto3.dynamodb.types import TypeDeserializer
+import time
+import os
+import logging
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
+from json_codec import to_json, from_json, parse_body
+
+# Request tracing is logged at DEBUG; set LOG_LEVEL=DEBUG on the function to see it
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'WARNING'))
+
+# Keep DynamoDB connections alive between warm invocations so each call
+# doesn't pay a fresh TCP + TLS handshake
+boto_config = Config(
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+    max_pool_connections=10
+)
 
 # Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-dynamodb_client = boto3.client('dynamodb')
+dynamodb = boto3.resource('dynamodb', config=boto_config)
+dynamodb_client = boto3.client('dynamodb', config=boto_config)
 
 TABLE_NAME = 'academic_records'
+records_table = dynamodb.Table(TABLE_NAME)
+
+
+class FloatDeserializer(TypeDeserializer):
+    """Deserialize DynamoDB numbers straight to float instead of Decimal"""
+    def _deserialize_n(self, value):
+        return float(value)
+
+
+# Swap boto3's response deserializer for one that returns floats, so items can be
+# serialized without a per-value Decimal conversion callback. The resource, the
+# Table and dynamodb.meta.client all share this client's event handlers.
+float_injector = TransformationInjector(deserializer=FloatDeserializer())
+dynamodb.meta.client.meta.events.unregister(
+    'after-call.dynamodb', unique_id='dynamodb-attr-value-output'
+)
+dynamodb.meta.client.meta.events.register(
+    'after-call.dynamodb',
+    float_injector.inject_attribute_value_output,
+    unique_id='dynamodb-attr-value-output'
+)
+
+# Set once the table has been confirmed to exist in this container
+table_ready = False
+
+# GSIs that were ACTIVE when this container last checked the table. Tables
+# created by an older version fall back to the pre-index query for an index they
+# lack until migrate_academic_records.py has added it; while any is missing the
+# table is checked again every INDEX_RECHECK_SECONDS.
+INDEX_RECHECK_SECONDS = 300
+active_indexes = frozenset()
+index_recheck_at = None
+
+# Attributes the list views read; GSIs project only these (plus their keys)
+# so each write replicates less data to every index
+LIST_VIEW_ATTRIBUTES = [
+    'class_id', 'school_id', 'academic_year', 'grade', 'section', 'subject_id', 'subject_name',
+    'topic_name', 'teacher_id', 'teacher_name', 'status', 'notes', 'created_at', 'updated_at'
+]
+
+# Fields a new record needs to build its keys
+REQUIRED_RECORD_FIELDS = ('school_id', 'academic_year', 'grade', 'section', 'subject_id', 'topic_id')
+
+# Fields that may be changed through update_academic_record
+UPDATEABLE_FIELDS = frozenset({'status', 'teacher_id', 'teacher_name', 'subject_name', 'topic_name', 'notes'})
+
+# DynamoDB batch limits
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+BATCH_MAX_ATTEMPTS = 5
+BATCH_MAX_WORKERS = 4
+
+# CORS headers and constant response bodies, built once per container
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+}
+OPTIONS_RESPONSE = {
+    'statusCode': 200,
+    'headers': CORS_HEADERS,
+    'body': ''
+}
+METHOD_NOT_ALLOWED_BODY = json.dumps({'error': 'Method not allowed'})
+INVALID_PATH_BODY = json.dumps({'error': 'Invalid path format'})
+MISSING_QUERY_PARAM_BODY = json.dumps({'error': 'Missing query parameter'})
+ENDPOINT_NOT_FOUND_BODY = json.dumps({'error': 'Endpoint not found'})
+INVALID_JSON_BODY = json.dumps({'error': 'Invalid JSON in request body'})
 
 # Status options
-VALID_STATUSES = ['not_started', 'in_progress', 'completed', 'on_hold', 'cancelled']
+VALID_STATUSES = frozenset({'not_started', 'in_progress', 'completed', 'on_hold', 'cancelled'})
+
+
+def include_projection(*index_keys: str) -> Dict[str, Any]:
+    """Build an INCLUDE projection of the list-view attributes for a GSI keyed on index_keys"""
+    return {
+        'ProjectionType': 'INCLUDE',
+        'NonKeyAttributes': [attr for attr in LIST_VIEW_ATTRIBUTES if attr not in index_keys]
+    }
 
 
-class DecimalEncoder(json.JSONEncoder):
-    """Helper class to convert DynamoDB Decimal types to JSON"""
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+# Table definition, built once at import
+TABLE_SCHEMA = {
+    'TableName': TABLE_NAME,
+    'KeySchema': [
+        {
+            'AttributeName': 'record_id',
+            'KeyType': 'HASH'  # Partition key
+        },
+        {
+            'AttributeName': 'topic_id',
+            'KeyType': 'RANGE'  # Sort key
+        }
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'record_id', 'AttributeType': 'S'},
+        {'AttributeName': 'topic_id', 'AttributeType': 'S'},
+        {'AttributeName': 'teacher_id', 'AttributeType': 'S'},
+        {'AttributeName': 'school_id', 'AttributeType': 'S'},
+        {'AttributeName': 'class_id', 'AttributeType': 'S'},
+    ],
+    'GlobalSecondaryIndexes': [
+        {
+            'IndexName': 'teacher_id-index',
+            'KeySchema': [
+                {'AttributeName': 'teacher_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'topic_id', 'KeyType': 'RANGE'}
+            ],
+            'Projection': include_projection('teacher_id', 'topic_id')
+        },
+        {
+            'IndexName': 'school_id-index',
+            'KeySchema': [
+                {'AttributeName': 'school_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'record_id', 'KeyType': 'RANGE'}
+            ],
+            'Projection': include_projection('school_id', 'record_id')
+        },
+        {
+            'IndexName': 'topic_id-index',
+            'KeySchema': [
+                {'AttributeName': 'topic_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'record_id', 'KeyType': 'RANGE'}
+            ],
+            'Projection': include_projection('topic_id', 'record_id')
+        },
+        {
+            'IndexName': 'class_id-index',
+            'KeySchema': [
+                {'AttributeName': 'class_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'record_id', 'KeyType': 'RANGE'}
+            ],
+            'Projection': include_projection('class_id', 'record_id')
+        }
+    ],
+    # On-demand capacity absorbs bursts (e.g. end-of-term status updates)
+    # instead of throttling; GSIs inherit the billing mode
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+SCHEMA_INDEX_NAMES = frozenset(index['IndexName'] for index in TABLE_SCHEMA['GlobalSecondaryIndexes'])
 
 
 def create_table_if_not_exists():
-    """Create DynamoDB table if it doesn't exist"""
+    """Create DynamoDB table if it doesn't exist, and note which GSIs are usable"""
+    global active_indexes, index_recheck_at
     try:
         # Check if table exists
-        existing_tables = dynamodb_client.list_tables()['TableNames']
-        
-        if TABLE_NAME in existing_tables:
+        try:
+            description = dynamodb_client.describe_table(TableName=TABLE_NAME)['Table']
+            active_indexes = frozenset(
+                index['IndexName'] for index in description.get('GlobalSecondaryIndexes', [])
+                if index['IndexStatus'] == 'ACTIVE'
+            )
+            if SCHEMA_INDEX_NAMES <= active_indexes:
+                index_recheck_at = None
+            else:
+                index_recheck_at = time.monotonic() + INDEX_RECHECK_SECONDS
             print(f"Table {TABLE_NAME} already exists")
             return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
         
         print(f"Creating table {TABLE_NAME}...")
         
         # Create table
-        table = dynamodb.create_table(
-            TableName=TABLE_NAME,
-            KeySchema=[
-                {
-                    'AttributeName': 'record_id',
-                    'KeyType': 'HASH'  # Partition key
-                },
-                {
-                    'AttributeName': 'topic_id',
-                    'KeyType': 'RANGE'  # Sort key
-                }
-            ],
-            AttributeDefinitions=[
-                {'AttributeName': 'record_id', 'AttributeType': 'S'},
-                {'AttributeName': 'topic_id', 'AttributeType': 'S'},
-                {'AttributeName': 'parent_phone', 'AttributeType': 'S'},
-                {'AttributeName': 'teacher_id', 'AttributeType': 'S'},
-                {'AttributeName': 'school_id', 'AttributeType': 'S'},
-            ],
-            GlobalSecondaryIndexes=[
-                {
-                    'IndexName': 'parent_phone-index',
-                    'KeySchema': [
-                        {'AttributeName': 'parent_phone', 'KeyType': 'HASH'},
-                        {'AttributeName': 'topic_id', 'KeyType': 'RANGE'}
-                    ],
-                    'Projection': {'ProjectionType': 'ALL'},
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': 5,
-                        'WriteCapacityUnits': 5
-                    }
-                },
-                {
-                    'IndexName': 'teacher_id-index',
-                    'KeySchema': [
-                        {'AttributeName': 'teacher_id', 'KeyType': 'HASH'},
-                        {'AttributeName': 'topic_id', 'KeyType': 'RANGE'}
-                    ],
-                    'Projection': {'ProjectionType': 'ALL'},
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': 5,
-                        'WriteCapacityUnits': 5
-                    }
-                },
-                {
-                    'IndexName': 'school_id-index',
-                    'KeySchema': [
-                        {'AttributeName': 'school_id', 'KeyType': 'HASH'},
-                        {'AttributeName': 'record_id', 'KeyType': 'RANGE'}
-                    ],
-                    'Projection': {'ProjectionType': 'ALL'},
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': 5,
-                        'WriteCapacityUnits': 5
-                    }
-                }
-            ],
-            ProvisionedThroughput={
-                'ReadCapacityUnits': 5,
-                'WriteCapacityUnits': 5
-            }
-        )
+        table = dynamodb.create_table(**TABLE_SCHEMA)
         
         # Wait for table to be created
         print(f"Waiting for table {TABLE_NAME} to be created...")
         table.wait_until_exists()
         print(f"Table {TABLE_NAME} created successfully")
         
+        # Indexes created with the table are active with it
+        active_indexes = SCHEMA_INDEX_NAMES
+        index_recheck_at = None
         return True
         
     except Exception as e:
@@ -133,64 +236,160 @@ def create_table_if_not_exists():
         return False
 
 
+def query_all_items(**query_kwargs) -> List[Dict[str, Any]]:
+    """Run a query and follow LastEvaluatedKey so results past the 1 MB page limit aren't dropped"""
+    items = []
+    while True:
+        response = records_table.query(**query_kwargs)
+        items.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def scan_all_items(**scan_kwargs) -> List[Dict[str, Any]]:
+    """Run a scan and follow LastEvaluatedKey across pages"""
+    items = []
+    while True:
+        response = records_table.scan(**scan_kwargs)
+        items.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return items
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def build_projection(fields: Optional[str]) -> Dict[str, Any]:
+    """Translate a comma-separated `fields` parameter into ProjectionExpression kwargs"""
+    if not fields:
+        return {}
+    
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    if not names:
+        return {}
+    
+    # Use placeholders for every attribute so reserved words (e.g. status) are allowed
+    placeholders = {f'#f{i}': name for i, name in enumerate(names)}
+    return {
+        'ProjectionExpression': ', '.join(placeholders),
+        'ExpressionAttributeNames': placeholders
+    }
+
+
+def generate_class_id(school_id: str, academic_year: str, grade: str, section: str) -> str:
+    """Generate a composite class ID (the record ID without the subject)"""
+    return f"{school_id}#{academic_year}#{grade}#{section}"
+
+
 def generate_record_id(school_id: str, academic_year: str, grade: str, section: str, subject_id: str) -> str:
     """Generate a composite record ID"""
-    return f"{school_id}#{academic_year}#{grade}#{section}#{subject_id}"
+    return f"{generate_class_id(school_id, academic_year, grade, section)}#{subject_id}"
 
 
-def create_academic_record(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Create a new academic record"""
-    try:
-        table = dynamodb.Table(TABLE_NAME)
-        
-        # Generate record_id
-        record_id = generate_record_id(
+def backfill_class_ids() -> int:
+    """Add class_id to records created before the class_id-index existed"""
+    updated = 0
+    scan_kwargs = {
+        'FilterExpression': 'attribute_not_exists(class_id)',
+        'ProjectionExpression': 'record_id, topic_id'
+    }
+    while True:
+        response = records_table.scan(**scan_kwargs)
+        for item in response['Items']:
+            # The condition keeps a record deleted since the scan from being recreated
+            try:
+                records_table.update_item(
+                    Key={'record_id': item['record_id'], 'topic_id': item['topic_id']},
+                    UpdateExpression='SET class_id = :class_id',
+                    ConditionExpression='attribute_exists(record_id)',
+                    ExpressionAttributeValues={':class_id': item['record_id'].rsplit('#', 1)[0]}
+                )
+                updated += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        if 'LastEvaluatedKey' not in response:
+            return updated
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def build_academic_record(data: Dict[str, Any], now: str) -> Dict[str, Any]:
+    """Build the DynamoDB item for a new academic record created at `now`"""
+    # Generate record_id
+    record_id = generate_record_id(
+        data['school_id'],
+        data['academic_year'],
+        data['grade'],
+        data['section'],
+        data['subject_id']
+    )
+    
+    record = {
+        'record_id': record_id,
+        'topic_id': data['topic_id'],
+        'class_id': generate_class_id(
             data['school_id'],
             data['academic_year'],
             data['grade'],
-            data['section'],
-            data['subject_id']
-        )
-        
+            data['section']
+        ),
+        'school_id': data['school_id'],
+        'academic_year': data['academic_year'],
+        'grade': str(data['grade']),
+        'section': data['section'].upper(),
+        'subject_id': data['subject_id'],
+        'subject_name': data.get('subject_name', ''),
+        'topic_name': data.get('topic_name', ''),
+        'status': data.get('status', 'not_started'),
+        'notes': data.get('notes', ''),
+        'created_at': now,
+        'updated_at': now
+    }
+    
+    # Only add teacher fields if they have values (DynamoDB doesn't allow empty strings in GSI keys)
+    if data.get('teacher_id'):
+        record['teacher_id'] = data['teacher_id']
+    if data.get('teacher_name'):
+        record['teacher_name'] = data['teacher_name']
+    
+    return record
+
+
+def create_academic_record(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Create a new academic record"""
+    try:
         # Validate status
         status = data.get('status', 'not_started')
         if status not in VALID_STATUSES:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': f'Invalid status. Must be one of: {VALID_STATUSES}'})
+                'body': json.dumps({'error': f'Invalid status. Must be one of: {sorted(VALID_STATUSES)}'})
             }
         
         # Create record
-        record = {
-            'record_id': record_id,
-            'topic_id': data['topic_id'],
-            'school_id': data['school_id'],
-            'academic_year': data['academic_year'],
-            'grade': str(data['grade']),
-            'section': data['section'].upper(),
-            'subject_id': data['subject_id'],
-            'subject_name': data.get('subject_name', ''),
-            'topic_name': data.get('topic_name', ''),
-            'status': status,
-            'notes': data.get('notes', ''),
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
-        }
-        
-        # Only add teacher fields if they have values (DynamoDB doesn't allow empty strings in GSI keys)
-        if data.get('teacher_id'):
-            record['teacher_id'] = data['teacher_id']
-        if data.get('teacher_name'):
-            record['teacher_name'] = data['teacher_name']
+        record = build_academic_record(data, datetime.now(timezone.utc).isoformat())
         
-        # Add to DynamoDB
-        table.put_item(Item=record)
+        # Add to DynamoDB - the condition rejects duplicates in the same round-trip
+        records_table.put_item(
+            Item=record,
+            ConditionExpression='attribute_not_exists(record_id) AND attribute_not_exists(topic_id)'
+        )
         
         return {
             'statusCode': 201,
-            'body': json.dumps(record, cls=DecimalEncoder)
+            'body': to_json(record)
         }
         
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return {
+                'statusCode': 409,
+                'body': json.dumps({'error': 'Record already exists'})
+            }
+        print(f"Error creating record: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
     except Exception as e:
         print(f"Error creating record: {str(e)}")
         return {
@@ -199,16 +398,15 @@ def create_academic_record(data: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-def get_academic_record(record_id: str, topic_id: str) -> Dict[str, Any]:
+def get_academic_record(record_id: str, topic_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
     """Get a specific academic record"""
     try:
-        table = dynamodb.Table(TABLE_NAME)
-        
-        response = table.get_item(
+        response = records_table.get_item(
             Key={
                 'record_id': record_id,
                 'topic_id': topic_id
-            }
+            },
+            **build_projection(fields)
         )
         
         if 'Item' not in response:
@@ -219,7 +417,7 @@ def get_academic_record(record_id: str, topic_id: str) -> Dict[str, Any]:
         
         return {
             'statusCode': 200,
-            'body': json.dumps(response['Item'], cls=DecimalEncoder)
+            'body': to_json(response['Item'])
         }
         
     except Exception as e:
@@ -233,41 +431,41 @@ def get_academic_record(record_id: str, topic_id: str) -> Dict[str, Any]:
 def update_academic_record(record_id: str, topic_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
     """Update an existing academic record"""
     try:
-        table = dynamodb.Table(TABLE_NAME)
+        if 'status' in updates and updates['status'] not in VALID_STATUSES:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': f'Invalid status. Must be one of: {sorted(VALID_STATUSES)}'})
+            }
         
-        # Build update expression
-        update_expr = "SET updated_at = :updated_at"
-        expr_values = {':updated_at': datetime.utcnow().isoformat()}
+        # Build update expression from the updateable fields present in the request.
+        # Attribute names go through placeholders because 'status' is a reserved word.
+        set_parts = ['updated_at = :updated_at']
+        expr_values = {':updated_at': datetime.now(timezone.utc).isoformat()}
+        expr_names = {}
         
-        # Add updateable fields
-        updateable_fields = [
-            'status', 'teacher_id', 'teacher_name', 'subject_name', 'topic_name', 'notes'
-        ]
+        for field in UPDATEABLE_FIELDS & updates.keys():
+            set_parts.append(f"#{field} = :{field}")
+            expr_names[f'#{field}'] = field
+            expr_values[f':{field}'] = updates[field]
         
-        for field in updateable_fields:
-            if field in updates:
-                if field == 'status' and updates[field] not in VALID_STATUSES:
-                    return {
-                        'statusCode': 400,
-                        'body': json.dumps({'error': f'Invalid status. Must be one of: {VALID_STATUSES}'})
-                    }
-                update_expr += f", {field} = :{field}"
-                expr_values[f':{field}'] = updates[field]
-        
-        # Update record
-        response = table.update_item(
-            Key={
+        update_params = {
+            'Key': {
                 'record_id': record_id,
                 'topic_id': topic_id
             },
-            UpdateExpression=update_expr,
-            ExpressionAttributeValues=expr_values,
-            ReturnValues='ALL_NEW'
-        )
+            'UpdateExpression': 'SET ' + ', '.join(set_parts),
+            'ExpressionAttributeValues': expr_values,
+            'ReturnValues': 'ALL_NEW'
+        }
+        if expr_names:
+            update_params['ExpressionAttributeNames'] = expr_names
+        
+        # Update record
+        response = records_table.update_item(**update_params)
         
         return {
             'statusCode': 200,
-            'body': json.dumps(response['Attributes'], cls=DecimalEncoder)
+            'body': to_json(response['Attributes'])
         }
         
     except Exception as e:
@@ -281,9 +479,7 @@ def update_academic_record(record_id: str, topic_id: str, updates: Dict[str, Any
 def delete_academic_record(record_id: str, topic_id: str) -> Dict[str, Any]:
     """Delete an academic record"""
     try:
-        table = dynamodb.Table(TABLE_NAME)
-        
-        table.delete_item(
+        records_table.delete_item(
             Key={
                 'record_id': record_id,
                 'topic_id': topic_id
@@ -303,25 +499,178 @@ def delete_academic_record(record_id: str, topic_id: str) -> Dict[str, Any]:
         }
 
 
+def run_concurrently(func, args_list: List[Any]) -> List[Any]:
+    """Call func on each argument, in parallel threads when there is more than one"""
+    if len(args_list) <= 1:
+        return [func(args) for args in args_list]
+    with ThreadPoolExecutor(max_workers=min(len(args_list), BATCH_MAX_WORKERS)) as executor:
+        return list(executor.map(func, args_list))
+
+
+def write_batch_chunk(items: List[Dict[str, Any]]) -> None:
+    """Write up to 25 items, retrying UnprocessedItems with backoff"""
+    request_items = {TABLE_NAME: [{'PutRequest': {'Item': item}} for item in items]}
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        # The low-level client is thread-safe; the resource object is not
+        response = dynamodb.meta.client.batch_write_item(RequestItems=request_items)
+        request_items = response.get('UnprocessedItems')
+        if not request_items:
+            return
+        # Backoff: 100ms, 200ms, 400ms, ...
+        time.sleep(0.1 * (2 ** attempt))
+    raise RuntimeError('Some records were not written after retries')
+
+
+def get_batch_chunk(keys: List[Dict[str, str]], projection: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Read up to 100 keys, retrying UnprocessedKeys with backoff"""
+    items = []
+    request_items = {TABLE_NAME: {'Keys': keys, **projection}}
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        # The low-level client is thread-safe; the resource object is not
+        response = dynamodb.meta.client.batch_get_item(RequestItems=request_items)
+        items.extend(response['Responses'].get(TABLE_NAME, []))
+        request_items = response.get('UnprocessedKeys')
+        if not request_items:
+            return items
+        # Backoff: 100ms, 200ms, 400ms, ...
+        time.sleep(0.1 * (2 ** attempt))
+    raise RuntimeError('Some records were not read after retries')
+
+
+def batch_create_academic_records(records: Any) -> Dict[str, Any]:
+    """Upsert many academic records with BatchWriteItem.
+
+    Unlike create_academic_record, an existing record with the same key is
+    replaced rather than rejected.
+    """
+    try:
+        if not isinstance(records, list) or not records:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'records must be a non-empty list'})
+            }
+        
+        # Validate every record before writing anything
+        for index, data in enumerate(records):
+            if not isinstance(data, dict):
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': f'Record {index}: must be an object'})
+                }
+            missing = [field for field in REQUIRED_RECORD_FIELDS if not data.get(field)]
+            if missing:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': f'Record {index}: missing required fields: {", ".join(missing)}'})
+                }
+            if data.get('status', 'not_started') not in VALID_STATUSES:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': f'Invalid status. Must be one of: {sorted(VALID_STATUSES)}'})
+                }
+        
+        now = datetime.now(timezone.utc).isoformat()
+        
+        # BatchWriteItem rejects a request that names the same key twice; a later
+        # record for a key replaces an earlier one, as separate puts would
+        items = list({
+            (item['record_id'], item['topic_id']): item
+            for item in (build_academic_record(data, now) for data in records)
+        }.values())
+        
+        # BatchWriteItem accepts at most 25 items per call; chunks are independent
+        # so they are written concurrently
+        chunks = [items[start:start + BATCH_WRITE_SIZE] for start in range(0, len(items), BATCH_WRITE_SIZE)]
+        run_concurrently(write_batch_chunk, chunks)
+        
+        return {
+            'statusCode': 201,
+            'body': to_json(items)
+        }
+        
+    except Exception as e:
+        print(f"Error batch creating records: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def parse_batch_keys(keys_param: Optional[str]) -> List[Dict[str, str]]:
+    """Parse the `keys` query parameter into unique (record_id, topic_id) keys.
+
+    Raises ValueError with a client-facing message if the parameter is malformed.
+    """
+    try:
+        keys = from_json(keys_param or '[]')
+    except ValueError:
+        raise ValueError('keys must be a JSON array')
+    if not isinstance(keys, list) or not keys:
+        raise ValueError('keys must be a non-empty JSON array')
+    
+    # BatchGetItem rejects a request that names the same key twice
+    unique_keys = {}
+    for index, key in enumerate(keys):
+        if not isinstance(key, dict) or not all(
+                isinstance(key.get(field), str) and key[field] for field in ('record_id', 'topic_id')):
+            raise ValueError(f'Key {index}: must be an object with record_id and topic_id strings')
+        unique_keys.setdefault((key['record_id'], key['topic_id']),
+                               {'record_id': key['record_id'], 'topic_id': key['topic_id']})
+    return list(unique_keys.values())
+
+
+def batch_get_academic_records(keys_param: Optional[str], fields: Optional[str] = None) -> Dict[str, Any]:
+    """Get many academic records by (record_id, topic_id) with BatchGetItem"""
+    try:
+        try:
+            keys = parse_batch_keys(keys_param)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
+            }
+        
+        # BatchGetItem accepts at most 100 keys per call; chunks are independent
+        # so they are read concurrently
+        projection = build_projection(fields)
+        chunks = [keys[start:start + BATCH_GET_SIZE] for start in range(0, len(keys), BATCH_GET_SIZE)]
+        items = [
+            item
+            for chunk_items in run_concurrently(lambda chunk: get_batch_chunk(chunk, projection), chunks)
+            for item in chunk_items
+        ]
+        
+        return {
+            'statusCode': 200,
+            'body': to_json(items)
+        }
+        
+    except Exception as e:
+        print(f"Error batch getting records: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
 # Parent phone query removed - parent fields no longer used
 
 
-def query_by_teacher_id(teacher_id: str) -> Dict[str, Any]:
+def query_by_teacher_id(teacher_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
     """Query records by teacher ID"""
     try:
-        table = dynamodb.Table(TABLE_NAME)
-        
-        response = table.query(
+        items = query_all_items(
             IndexName='teacher_id-index',
             KeyConditionExpression='teacher_id = :teacher',
             ExpressionAttributeValues={
                 ':teacher': teacher_id
-            }
+            },
+            **build_projection(fields)
         )
         
         return {
             'statusCode': 200,
-            'body': json.dumps(response['Items'], cls=DecimalEncoder)
+            'body': to_json(items)
         }
         
     except Exception as e:
@@ -332,22 +681,21 @@ def query_by_teacher_id(teacher_id: str) -> Dict[str, Any]:
         }
 
 
-def query_by_school_id(school_id: str) -> Dict[str, Any]:
+def query_by_school_id(school_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
     """Query records by school ID"""
     try:
-        table = dynamodb.Table(TABLE_NAME)
-        
-        response = table.query(
+        items = query_all_items(
             IndexName='school_id-index',
             KeyConditionExpression='school_id = :school',
             ExpressionAttributeValues={
                 ':school': school_id
-            }
+            },
+            **build_projection(fields)
         )
         
         return {
             'statusCode': 200,
-            'body': json.dumps(response['Items'], cls=DecimalEncoder)
+            'body': to_json(items)
         }
         
     except Exception as e:
@@ -358,26 +706,36 @@ def query_by_school_id(school_id: str) -> Dict[str, Any]:
         }
 
 
-def list_records_by_class(school_id: str, academic_year: str, grade: str, section: str) -> Dict[str, Any]:
+def list_records_by_class(school_id: str, academic_year: str, grade: str, section: str, fields: Optional[str] = None) -> Dict[str, Any]:
     """List all records for a specific class"""
     try:
-        table = dynamodb.Table(TABLE_NAME)
-        
-        # Query by school_id and filter by record_id pattern
-        record_id_prefix = f"{school_id}#{academic_year}#{grade}#{section}#"
-        
-        response = table.query(
-            IndexName='school_id-index',
-            KeyConditionExpression='school_id = :school AND begins_with(record_id, :prefix)',
-            ExpressionAttributeValues={
-                ':school': school_id,
-                ':prefix': record_id_prefix
-            }
-        )
+        class_id = generate_class_id(school_id, academic_year, grade, section)
+        if 'class_id-index' in active_indexes:
+            # Every record of the class shares one class_id, so a single key lookup
+            # on class_id-index replaces a begins_with range over the whole school
+            items = query_all_items(
+                IndexName='class_id-index',
+                KeyConditionExpression='class_id = :class_id',
+                ExpressionAttributeValues={
+                    ':class_id': class_id
+                },
+                **build_projection(fields)
+            )
+        else:
+            # Table not migrated yet: range over the school's record IDs
+            items = query_all_items(
+                IndexName='school_id-index',
+                KeyConditionExpression='school_id = :school AND begins_with(record_id, :prefix)',
+                ExpressionAttributeValues={
+                    ':school': school_id,
+                    ':prefix': f"{class_id}#"
+                },
+                **build_projection(fields)
+            )
         
         return {
             'statusCode': 200,
-            'body': json.dumps(response['Items'], cls=DecimalEncoder)
+            'body': to_json(items)
         }
         
     except Exception as e:
@@ -388,22 +746,31 @@ def list_records_by_class(school_id: str, academic_year: str, grade: str, sectio
         }
 
 
-def query_by_topic_id(topic_id: str) -> Dict[str, Any]:
+def query_by_topic_id(topic_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
     """Query all records for a specific topic"""
     try:
-        table = dynamodb.Table(TABLE_NAME)
-        
-        # Scan with filter (topic_id is the sort key, so we need to scan)
-        response = table.scan(
-            FilterExpression='topic_id = :topic_id',
-            ExpressionAttributeValues={
-                ':topic_id': topic_id
-            }
-        )
+        if 'topic_id-index' in active_indexes:
+            items = query_all_items(
+                IndexName='topic_id-index',
+                KeyConditionExpression='topic_id = :topic_id',
+                ExpressionAttributeValues={
+                    ':topic_id': topic_id
+                },
+                **build_projection(fields)
+            )
+        else:
+            # Table not migrated yet: topic_id is only the sort key, so scan
+            items = scan_all_items(
+                FilterExpression='topic_id = :topic_id',
+                ExpressionAttributeValues={
+                    ':topic_id': topic_id
+                },
+                **build_projection(fields)
+            )
         
         return {
             'statusCode': 200,
-            'body': json.dumps(response['Items'], cls=DecimalEncoder)
+            'body': to_json(items)
         }
         
     except Exception as e:
@@ -414,28 +781,77 @@ def query_by_topic_id(topic_id: str) -> Dict[str, Any]:
         }
 
 
+def query_records(query_params: Dict[str, str]) -> Dict[str, Any]:
+    """GET /academic-records - pick the query from the parameters present"""
+    fields = query_params.get('fields')
+    if 'teacher_id' in query_params:
+        return query_by_teacher_id(query_params['teacher_id'], fields)
+    if 'school_id' in query_params:
+        if all(k in query_params for k in ['academic_year', 'grade', 'section']):
+            return list_records_by_class(
+                query_params['school_id'],
+                query_params['academic_year'],
+                query_params['grade'],
+                query_params['section'],
+                fields
+            )
+        return query_by_school_id(query_params['school_id'], fields)
+    return {
+        'statusCode': 400,
+        'body': MISSING_QUERY_PARAM_BODY
+    }
+
+
+# Routing table: path segments ('*' matches any single segment) -> method -> handler.
+# Handlers take (path_args, body, query_params), where path_args are the wildcard segments.
+ROUTES = {
+    ('academic-records',): {
+        'POST': lambda args, body, params: create_academic_record(body),
+        'GET': lambda args, body, params: query_records(params),
+    },
+    ('academic-records', 'batch'): {
+        'POST': lambda args, body, params: batch_create_academic_records(
+            body.get('records') if isinstance(body, dict) else None
+        ),
+        # Keys are passed as a JSON list of {record_id, topic_id}
+        'GET': lambda args, body, params: batch_get_academic_records(params.get('keys'), params.get('fields')),
+    },
+    ('records', 'topic', '*'): {
+        'GET': lambda args, body, params: query_by_topic_id(args[0], params.get('fields')),
+    },
+    ('academic-records', '*', '*'): {
+        'GET': lambda args, body, params: get_academic_record(args[0], args[1], params.get('fields')),
+        'PUT': lambda args, body, params: update_academic_record(args[0], args[1], body),
+        'DELETE': lambda args, body, params: delete_academic_record(args[0], args[1]),
+    },
+}
+WILDCARD_ROUTES = [(pattern, methods) for pattern, methods in ROUTES.items() if '*' in pattern]
+
+
+def match_route(path_parts: tuple):
+    """Return (methods, wildcard segments) for a split path, or (None, ()) if nothing matches"""
+    methods = ROUTES.get(path_parts)
+    if methods is not None:
+        return methods, ()
+    for pattern, methods in WILDCARD_ROUTES:
+        if len(pattern) == len(path_parts) and all(p == '*' or p == part for p, part in zip(pattern, path_parts)):
+            return methods, tuple(part for p, part in zip(pattern, path_parts) if p == '*')
+    return None, ()
+
+
 def lambda_handler(event, context):
     """Main Lambda handler"""
-    print(f"Event: {json.dumps(event)}")
-    
-    # Ensure table exists
-    create_table_if_not_exists()
-    
-    # Set CORS headers
-    headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-    }
+    global table_ready
+    logger.debug("Event: %s", event)
     
     # Handle OPTIONS request for CORS
     if event.get('httpMethod') == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': ''
-        }
+        return OPTIONS_RESPONSE
+    
+    # Ensure table exists - only checked once per container so warm
+    # invocations skip the DescribeTable round-trip (unless an index is missing)
+    if not table_ready or (index_recheck_at is not None and time.monotonic() >= index_recheck_at):
+        table_ready = create_table_if_not_exists()
     
     try:
         # Get HTTP method and path
@@ -443,101 +859,51 @@ def lambda_handler(event, context):
         path = event.get('path', '')
         
         # Parse body if present
-        body = {}
-        if event.get('body'):
-            body = json.loads(event['body'])
+        try:
+            body = parse_body(event)
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'headers': CORS_HEADERS,
+                'body': INVALID_JSON_BODY
+            }
         
         # Parse query parameters
         query_params = event.get('queryStringParameters') or {}
         
-        # Route requests
-        if path == '/academic-records':
-            if http_method == 'POST':
-                # Create new record
-                response = create_academic_record(body)
-            elif http_method == 'GET':
-                # Query records
-                if 'teacher_id' in query_params:
-                    response = query_by_teacher_id(query_params['teacher_id'])
-                elif 'school_id' in query_params:
-                    if all(k in query_params for k in ['academic_year', 'grade', 'section']):
-                        response = list_records_by_class(
-                            query_params['school_id'],
-                            query_params['academic_year'],
-                            query_params['grade'],
-                            query_params['section']
-                        )
-                    else:
-                        response = query_by_school_id(query_params['school_id'])
-                else:
-                    response = {
-                        'statusCode': 400,
-                        'body': json.dumps({'error': 'Missing query parameter'})
-                    }
-            else:
-                response = {
-                    'statusCode': 405,
-                    'body': json.dumps({'error': 'Method not allowed'})
-                }
+        # Route requests - split the path once and look up its handler
+        path_parts = tuple(path.strip('/').split('/'))
+        route, path_args = match_route(path_parts)
         
-        elif path.startswith('/records/topic/'):
-            # Handle GET /records/topic/{topicId}
-            path_parts = path.split('/')
-            if len(path_parts) >= 4:
-                topic_id = path_parts[3]
-                if http_method == 'GET':
-                    response = query_by_topic_id(topic_id)
-                else:
-                    response = {
-                        'statusCode': 405,
-                        'body': json.dumps({'error': 'Method not allowed'})
-                    }
-            else:
+        if route is None:
+            # Known resource but wrong number of path segments
+            if path.startswith('/academic-records/') or path.startswith('/records/topic/'):
                 response = {
                     'statusCode': 400,
-                    'body': json.dumps({'error': 'Invalid path format'})
+                    'body': INVALID_PATH_BODY
                 }
-        
-        elif path.startswith('/academic-records/'):
-            # Extract record_id and topic_id from path
-            # Format: /academic-records/{record_id}/{topic_id}
-            path_parts = path.split('/')
-            if len(path_parts) >= 4:
-                record_id = path_parts[2]
-                topic_id = path_parts[3]
-                
-                if http_method == 'GET':
-                    response = get_academic_record(record_id, topic_id)
-                elif http_method == 'PUT':
-                    response = update_academic_record(record_id, topic_id, body)
-                elif http_method == 'DELETE':
-                    response = delete_academic_record(record_id, topic_id)
-                else:
-                    response = {
-                        'statusCode': 405,
-                        'body': json.dumps({'error': 'Method not allowed'})
-                    }
             else:
                 response = {
-                    'statusCode': 400,
-                    'body': json.dumps({'error': 'Invalid path format'})
+                    'statusCode': 404,
+                    'body': ENDPOINT_NOT_FOUND_BODY
                 }
-        
-        else:
+        elif http_method not in route:
             response = {
-                'statusCode': 404,
-                'body': json.dumps({'error': 'Endpoint not found'})
+                'statusCode': 405,
+                'body': METHOD_NOT_ALLOWED_BODY
             }
+        else:
+            response = route[http_method](path_args, body, query_params)
         
         # Add headers to response
-        response['headers'] = headers
+        response['headers'] = CORS_HEADERS
         return response
         
     except Exception as e:
         print(f"Error in lambda_handler: {str(e)}")
         return {
             'statusCode': 500,
-            'headers': headers,
+            'headers': CORS_HEADERS,
             'body': json.dumps({'error': str(e)})
         }
 
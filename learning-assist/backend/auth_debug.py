@@ -1,20 +1,40 @@
 import json
 import traceback
 
+# Import required modules once at cold start; a failure is reported by the
+# handler instead of breaking the function load
+import_error = None
+import_traceback = None
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+    import hashlib
+    import base64
+    from datetime import datetime, timedelta
+    from decimal import Decimal
+    import time
+    import os
+except ImportError as e:
+    import_error = str(e)
+    import_traceback = traceback.format_exc()
+
+# Try to import JWT
+try:
+    import jwt
+    jwt_available = True
+except ImportError:
+    try:
+        from simple_jwt import jwt
+        jwt_available = True
+    except ImportError:
+        jwt_available = False
+
+boto3_available = 'boto3' in globals()
+
 def lambda_handler(event, context):
     """Debug version of auth function with better error handling"""
     try:
-        # Try to import required modules
-        try:
-            import boto3
-            from botocore.exceptions import ClientError
-            import hashlib
-            import base64
-            from datetime import datetime, timedelta
-            from decimal import Decimal
-            import time
-            import os
-        except ImportError as e:
+        if import_error:
             return {
                 'statusCode': 500,
                 'headers': {
@@ -22,22 +42,11 @@ def lambda_handler(event, context):
                     'Access-Control-Allow-Origin': '*'
                 },
                 'body': json.dumps({
-                    'error': f'Import error: {str(e)}',
-                    'traceback': traceback.format_exc()
+                    'error': f'Import error: {import_error}',
+                    'traceback': import_traceback
                 })
             }
         
-        # Try to import JWT
-        try:
-            import jwt
-            jwt_available = True
-        except ImportError:
-            try:
-                from simple_jwt import jwt
-                jwt_available = True
-            except ImportError:
-                jwt_available = False
-        
         # Get HTTP method and path
         http_method = event.get('httpMethod', 'GET')
         path = event.get('path', '')
@@ -66,7 +75,7 @@ def lambda_handler(event, context):
                 'jwt_available': jwt_available,
                 'method': http_method,
                 'path': path,
-                'boto3_available': 'boto3' in globals()
+                'boto3_available': boto3_available
             })
         }
         
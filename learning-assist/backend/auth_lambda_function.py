@@ -4,293 +4,843 @@ import uuid
 import hashlib
 import hmac
 import base64
-from datetime import datetime, timedelta
-from decimal import Decimal
+import calendar
+import re
+import string
+import unicodedata
+from datetime import datetime
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import time
 import os
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from json_codec import to_json, from_json, parse_body
+
+# Request tracing is logged at DEBUG; set LOG_LEVEL=DEBUG on the function to see it
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'WARNING'))
+
+# Keep connections to DynamoDB alive between calls and warm invocations so
+# requests skip the TCP/TLS handshake; short timeouts keep a stalled call
+# from eating the function's 30s budget
+boto_config = Config(
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+    max_pool_connections=10,
+    connect_timeout=5,
+    read_timeout=10
+)
 
 # Initialize DynamoDB client
-dynamodb = boto3.resource('dynamodb')
+dynamodb = boto3.resource('dynamodb', config=boto_config)
 users_table_name = 'learning_assist_users'
+users_table = dynamodb.Table(users_table_name)
+
+# Login lookups go through the low-level client with hand-written key
+# conditions, skipping the resource layer's condition-tree build and
+# per-call serialization; only the single matched item is deserialized
+dynamodb_client = boto3.client('dynamodb', config=boto_config)
+deserializer = TypeDeserializer()
+
+# Strips phone number formatting. Input is NFKC-normalized first, which folds
+# pasted full-width digits to ASCII and NBSP/full-width punctuation to plain forms.
+PHONE_NON_DIGITS = re.compile(r'[^0-9]')
+
+# Set once the table has been confirmed to exist in this container
+table_ready = False
+
+# GSIs that were ACTIVE when this container last checked the table. Tables
+# created by an older version fall back to a scan for an index they lack until
+# migrate_users_table.py has added it; while any is missing the table is
+# checked again every INDEX_RECHECK_SECONDS.
+INDEX_RECHECK_SECONDS = 300
+active_indexes = frozenset()
+index_recheck_at = None
 
-# Simple token secret - in production, this should be more secure
-TOKEN_SECRET = os.environ.get('JWT_SECRET', 'default-secret-key')
+# HS256 signing secret for auth tokens, encoded once so PyJWT skips the conversion
+TOKEN_SECRET = os.environ.get('JWT_SECRET', 'default-secret-key').encode('utf-8')
 
-class DecimalEncoder(json.JSONEncoder):
-    """Helper class to convert Decimal objects to float for JSON serialization"""
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+# Shared response headers and fixed bodies, built once per container
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS'
+}
+OPTIONS_RESPONSE = {
+    'statusCode': 200,
+    'headers': CORS_HEADERS,
+    'body': ''
+}
+INVALID_JSON_BODY = json.dumps({'error': 'Invalid JSON in request body'})
+ENDPOINT_NOT_FOUND_BODY = json.dumps({'error': 'Endpoint not found'})
+INVALID_CREDENTIALS_BODY = json.dumps({'error': 'Invalid email or password'})
+NO_TOKEN_BODY = json.dumps({'error': 'No token provided'})
+USER_NOT_FOUND_BODY = json.dumps({'valid': False, 'error': 'User not found'})
+LOGIN_FIELDS_REQUIRED_BODY = json.dumps({'error': 'Email and password are required for standard login, or phone_number for parent login'})
+PHONE_REQUIRED_BODY = json.dumps({'error': 'Phone number is required'})
+INVALID_PHONE_BODY = json.dumps({'error': 'Invalid phone number format'})
+ADMIN_REQUIRED_BODY = json.dumps({'error': 'Admin token required'})
+NO_USERS_BODY = json.dumps({'error': 'No users provided'})
+EMAIL_EXISTS_ERROR = 'User with this email already exists'
+EMAIL_EXISTS_BODY = json.dumps({'error': EMAIL_EXISTS_ERROR})
+DUPLICATE_IN_BATCH_ERROR = 'Duplicate email in batch'
+DUPLICATE_EMAIL_ERRORS = frozenset({EMAIL_EXISTS_ERROR, DUPLICATE_IN_BATCH_ERROR})
+
+# Phone login (parent app) error bodies
+PHONE_NOT_REGISTERED_BODY = json.dumps({
+    'success': False,
+    'message': 'Phone number not found. Please contact your school administrator to register your phone number.',
+    'error': 'PHONE_NOT_REGISTERED'
+})
+PHONE_NOT_FOUND_BODY = json.dumps({
+    'success': False,
+    'message': 'Phone number not found. Please contact your school administrator to register your phone number.',
+    'error': 'PHONE_NOT_FOUND'
+})
+NOT_PARENT_USER_BODY = json.dumps({
+    'success': False,
+    'message': 'This phone number is not registered for parent access.',
+    'error': 'NOT_PARENT_USER'
+})
+ACCOUNT_DEACTIVATED_BODY = json.dumps({
+    'success': False,
+    'message': 'This account has been deactivated. Please contact your school administrator.',
+    'error': 'ACCOUNT_DEACTIVATED'
+})
+PHONE_LOGIN_ERROR_BODY = json.dumps({
+    'success': False,
+    'error': 'Internal server error',
+    'message': 'An error occurred during login. Please try again.'
+})
+
+# Verified tokens are cached briefly so repeat presentations skip the decode.
+# Entries are keyed by the first 128 bits of the token's SHA-256 as an int, never
+# the token itself.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 5  # seconds
+token_cache = OrderedDict()
+token_cache_lock = threading.Lock()
+
+# Tokens carry only the user id and type; /auth/verify looks the profile up
+# and keeps it for a short while per user
+USER_CACHE_SIZE = 1000
+USER_CACHE_TTL = 60  # seconds
+user_cache = OrderedDict()
+user_cache_lock = threading.Lock()
+
+# Table definition, built once at import
+USERS_TABLE_SCHEMA = {
+    'TableName': users_table_name,
+    'KeySchema': [
+        {
+            'AttributeName': 'user_id',
+            'KeyType': 'HASH'  # Partition key
+        }
+    ],
+    'GlobalSecondaryIndexes': [
+        {
+            'IndexName': 'email-index',
+            'KeySchema': [
+                {
+                    'AttributeName': 'email',
+                    'KeyType': 'HASH'
+                }
+            ],
+            'Projection': {
+                'ProjectionType': 'ALL'
+            },
+            'ProvisionedThroughput': {
+                'ReadCapacityUnits': 5,
+                'WriteCapacityUnits': 5
+            }
+        },
+        {
+            'IndexName': 'phone-index',
+            'KeySchema': [
+                {
+                    'AttributeName': 'phone_number',
+                    'KeyType': 'HASH'
+                }
+            ],
+            'Projection': {
+                'ProjectionType': 'ALL'
+            },
+            'ProvisionedThroughput': {
+                'ReadCapacityUnits': 5,
+                'WriteCapacityUnits': 5
+            }
+        }
+    ],
+    'AttributeDefinitions': [
+        {
+            'AttributeName': 'user_id',
+            'AttributeType': 'S'
+        },
+        {
+            'AttributeName': 'email',
+            'AttributeType': 'S'
+        },
+        {
+            'AttributeName': 'phone_number',
+            'AttributeType': 'S'
+        }
+    ],
+    'ProvisionedThroughput': {
+        'ReadCapacityUnits': 5,
+        'WriteCapacityUnits': 5
+    }
+}
+SCHEMA_INDEX_NAMES = frozenset(index['IndexName'] for index in USERS_TABLE_SCHEMA['GlobalSecondaryIndexes'])
 
 def create_users_table_if_not_exists():
-    """Create the DynamoDB users table if it doesn't exist"""
+    """Create the DynamoDB users table if it doesn't exist, and note which GSIs are usable"""
+    global active_indexes, index_recheck_at
     try:
         # Check if table exists
-        table = dynamodb.Table(users_table_name)
-        table.load()
-        return table
+        users_table.load()
+        active_indexes = frozenset(
+            index['IndexName'] for index in users_table.global_secondary_indexes or []
+            if index['IndexStatus'] == 'ACTIVE'
+        )
+        if SCHEMA_INDEX_NAMES <= active_indexes:
+            index_recheck_at = None
+        else:
+            index_recheck_at = time.monotonic() + INDEX_RECHECK_SECONDS
+        return users_table
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceNotFoundException':
             # Table doesn't exist, create it
-            table = dynamodb.create_table(
-                TableName=users_table_name,
-                KeySchema=[
-                    {
-                        'AttributeName': 'user_id',
-                        'KeyType': 'HASH'  # Partition key
-                    }
-                ],
-                GlobalSecondaryIndexes=[
-                    {
-                        'IndexName': 'email-index',
-                        'KeySchema': [
-                            {
-                                'AttributeName': 'email',
-                                'KeyType': 'HASH'
-                            }
-                        ],
-                        'Projection': {
-                            'ProjectionType': 'ALL'
-                        },
-                        'ProvisionedThroughput': {
-                            'ReadCapacityUnits': 5,
-                            'WriteCapacityUnits': 5
-                        }
-                    }
-                ],
-                AttributeDefinitions=[
-                    {
-                        'AttributeName': 'user_id',
-                        'AttributeType': 'S'
-                    },
-                    {
-                        'AttributeName': 'email',
-                        'AttributeType': 'S'
-                    }
-                ],
-                ProvisionedThroughput={
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            )
+            table = dynamodb.create_table(**USERS_TABLE_SCHEMA)
             
             # Wait for table to be created
             table.meta.client.get_waiter('table_exists').wait(TableName=users_table_name)
+            
+            # Indexes created with the table are active with it
+            active_indexes = SCHEMA_INDEX_NAMES
+            index_recheck_at = None
             return table
         else:
             raise e
 
-def hash_password(password: str, salt: str = None) -> tuple:
-    """Hash password with salt"""
+# Attributes each login path reads; '#name' stands in for the reserved word
+EMAIL_LOGIN_ATTRIBUTES = 'user_id, email, #name, user_type, class_access, school_id, password_hash, salt, kdf'
+PHONE_LOGIN_ATTRIBUTES = 'user_id, #name, user_type, class_access, school_id, is_active'
+
+def find_user(index_name: str, attribute: str, value: str, projection: str) -> Optional[dict]:
+    """Return the projected attributes of the first user whose GSI key equals value, or None"""
+    if index_name not in active_indexes:
+        return scan_for_user(attribute, value, projection)
+    
+    response = dynamodb_client.query(
+        TableName=users_table_name,
+        IndexName=index_name,
+        KeyConditionExpression=f'{attribute} = :value',
+        ExpressionAttributeValues={':value': {'S': value}},
+        ProjectionExpression=projection,
+        ExpressionAttributeNames={'#name': 'name'},
+        Limit=1
+    )
+    if not response['Items']:
+        return None
+    return {k: deserializer.deserialize(v) for k, v in response['Items'][0].items()}
+
+def scan_for_user(attribute: str, value: str, projection: str) -> Optional[dict]:
+    """find_user for a table that lacks the index yet: scan pages until a match"""
+    scan_kwargs = {
+        'TableName': users_table_name,
+        'FilterExpression': f'{attribute} = :value',
+        'ExpressionAttributeValues': {':value': {'S': value}},
+        'ProjectionExpression': projection,
+        'ExpressionAttributeNames': {'#name': 'name'}
+    }
+    while True:
+        response = dynamodb_client.scan(**scan_kwargs)
+        if response['Items']:
+            return {k: deserializer.deserialize(v) for k, v in response['Items'][0].items()}
+        if 'LastEvaluatedKey' not in response:
+            return None
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+PASSWORD_HASH_ITERATIONS = 100000
+
+# Parallel password hashes during bulk registration (scrypt uses 16MB each)
+KDF_MAX_WORKERS = 4
+
+REQUIRED_REGISTRATION_FIELDS = ['email', 'password', 'name', 'user_type']
+
+# Email uniqueness is enforced by a marker item per email in the users table
+EMAIL_MARKER_PREFIX = 'email#'
+
+# Stored alongside each hash so users can be migrated to the current KDF on login.
+# Items without a 'kdf' attribute predate the tag and use PBKDF2.
+KDF_PBKDF2 = 'pbkdf2-sha256-100k'
+KDF_SCRYPT = 'scrypt-16384'
+CURRENT_KDF = KDF_SCRYPT
+
+def pbkdf2_sha256_fallback(password: bytes, salt: bytes, iterations: int) -> bytes:
+    """PBKDF2-HMAC-SHA256 for builds where hashlib lacks the OpenSSL implementation.
+
+    The HMAC key schedule is done once and copied per iteration instead of
+    being recomputed, which is what makes the pure-Python loop tolerable.
+    """
+    base = hmac.new(password, None, hashlib.sha256)
+    
+    def prf(data):
+        ctx = base.copy()
+        ctx.update(data)
+        return ctx.digest()
+    
+    u = prf(salt + b'\x00\x00\x00\x01')  # a single block covers the 32-byte output
+    result = int.from_bytes(u, 'big')
+    for _ in range(iterations - 1):
+        u = prf(u)
+        result ^= int.from_bytes(u, 'big')
+    return result.to_bytes(32, 'big')
+
+# On standard Lambda runtimes hashlib is backed by OpenSSL (_hashlib), whose
+# SHA-256 uses the CPU's SHA extensions; the builtin _sha256 module does not
+OPENSSL_SHA256 = getattr(hashlib.sha256, '__module__', None) == '_hashlib'
+if not OPENSSL_SHA256:
+    print("WARNING: hashlib is not OpenSSL-backed; password hashing will be slow")
+
+if getattr(hashlib.pbkdf2_hmac, '__module__', None) == '_hashlib':
+    def pbkdf2_sha256(password: bytes, salt: bytes, iterations: int) -> bytes:
+        return hashlib.pbkdf2_hmac('sha256', password, salt, iterations)
+else:
+    pbkdf2_sha256 = pbkdf2_sha256_fallback
+
+def hash_password(password: str, salt: bytes = None, kdf: str = CURRENT_KDF) -> tuple:
+    """Hash password with salt using the given KDF, returning raw (hash, salt) bytes"""
     if salt is None:
-        salt = base64.b64encode(os.urandom(32)).decode('utf-8')
+        salt = os.urandom(32)
     
-    # Use PBKDF2 for secure password hashing
-    password_hash = hashlib.pbkdf2_hmac('sha256', 
-                                       password.encode('utf-8'), 
-                                       salt.encode('utf-8'), 
-                                       100000)  # 100,000 iterations
+    if kdf == KDF_SCRYPT:
+        password_hash = hashlib.scrypt(password.encode('utf-8'), salt=salt,
+                                       n=16384, r=8, p=1, dklen=32)
+    else:
+        password_hash = pbkdf2_sha256(password.encode('utf-8'), salt,
+                                      PASSWORD_HASH_ITERATIONS)
     
-    return base64.b64encode(password_hash).decode('utf-8'), salt
+    return password_hash, salt
+
+# Successful verifications are remembered for a few minutes so repeat logins in a
+# warm container skip the KDF. Entries are HMACs under a per-container random key
+# over the stored hash, salt and password: they mean nothing outside this process
+# and stop matching as soon as the stored hash changes.
+VERIFIED_PASSWORD_CACHE_SIZE = 128
+VERIFIED_PASSWORD_CACHE_TTL = 300  # seconds
+verified_password_key = os.urandom(32)
+verified_passwords = OrderedDict()
+verified_passwords_lock = threading.Lock()
 
-def verify_password(password: str, stored_hash: str, salt: str) -> bool:
+def verify_password(password: str, stored_hash, salt, kdf: str = KDF_PBKDF2) -> bool:
     """Verify password against stored hash"""
-    computed_hash, _ = hash_password(password, salt)
-    return hmac.compare_digest(stored_hash, computed_hash)
-
-def generate_simple_token(user_data: dict) -> str:
-    """Generate simple token without JWT (for testing)"""
-    token_data = {
-        'user_id': user_data['user_id'],
-        'email': user_data['email'],
-        'user_type': user_data['user_type'],
-        'exp': (datetime.utcnow() + timedelta(days=7)).isoformat()
+    if isinstance(stored_hash, str):
+        # Legacy items store the base64 digest as a string, and the base64 salt
+        # text itself was used as the salt
+        stored_hash = base64.b64decode(stored_hash)
+        salt = salt.encode('utf-8')
+    else:
+        # Binary attributes
+        stored_hash, salt = bytes(stored_hash), bytes(salt)
+    
+    key = hmac.new(verified_password_key, len(salt).to_bytes(2, 'big') + salt + stored_hash,
+                   hashlib.sha256)
+    key.update(password.encode('utf-8'))
+    key = key.digest()
+    with verified_passwords_lock:
+        expires_at = verified_passwords.get(key)
+        if expires_at is not None and expires_at > time.monotonic():
+            verified_passwords.move_to_end(key)
+            return True
+    
+    computed_hash, _ = hash_password(password, salt, kdf)
+    if not hmac.compare_digest(stored_hash, computed_hash):
+        return False
+    
+    with verified_passwords_lock:
+        verified_passwords[key] = time.monotonic() + VERIFIED_PASSWORD_CACHE_TTL
+        verified_passwords.move_to_end(key)
+        if len(verified_passwords) > VERIFIED_PASSWORD_CACHE_SIZE:
+            verified_passwords.popitem(last=False)
+    return True
+
+TOKEN_LIFETIME_SECONDS = 7 * 24 * 60 * 60
+
+# One PyJWT instance with fixed options; every token we issue carries exp.
+# PyJWT verifies tokens and is imported on first use, so preflight-only cold
+# starts and token issuing skip it. The codec is stored with the exception it
+# raises for expired tokens, which differs when PyJWT is not packaged.
+JWT_ALGORITHMS = ['HS256']
+jwt_codec = None
+
+# Cheap shape checks run before any hashing or decoding: a JWT is three
+# base64url segments joined by dots
+TOKEN_MIN_LENGTH = 32
+TOKEN_MAX_LENGTH = 4096
+TOKEN_CHARS = frozenset(string.ascii_letters + string.digits + '-_.')
+INVALID_TOKEN_RESULT = {'valid': False, 'error': 'Invalid token'}
+
+# Tokens are signed here rather than through PyJWT: the header never changes, so
+# its encoded segment is built once, and the HMAC key schedule is reused per token
+JWT_HEADER_SEGMENT = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b'=')
+jwt_signer = hmac.new(TOKEN_SECRET, digestmod=hashlib.sha256)
+
+def base64url(data: bytes) -> bytes:
+    """Unpadded base64url, as used in JWT segments"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+class TokenExpiredError(Exception):
+    """Raised by HS256Codec for a token past its exp claim"""
+
+class HS256Codec:
+    """Verifies the HS256 tokens generate_jwt_token issues, for when PyJWT is not packaged"""
+    
+    def decode(self, token: str, key: bytes, algorithms=None) -> dict:
+        signing_input, _, signature = token.encode('ascii').rpartition(b'.')
+        expected = hmac.new(key, signing_input, hashlib.sha256).digest()
+        if not hmac.compare_digest(base64url(expected), signature):
+            raise ValueError('Signature verification failed')
+        payload_segment = signing_input.partition(b'.')[2]
+        payload = from_json(base64.urlsafe_b64decode(payload_segment + b'=' * (-len(payload_segment) % 4)))
+        if not isinstance(payload.get('exp'), int):
+            raise ValueError('Token is missing the "exp" claim')
+        if payload['exp'] <= time.time():
+            raise TokenExpiredError('Signature has expired')
+        return payload
+
+def get_jwt_codec() -> tuple:
+    """Return (codec, expired_error), importing PyJWT on first use"""
+    global jwt_codec
+    if jwt_codec is None:
+        try:
+            import jwt
+            jwt_codec = (jwt.PyJWT(options={'require': ['exp']}), jwt.ExpiredSignatureError)
+        except ImportError:
+            print("WARNING: PyJWT is not packaged; verifying tokens with HS256Codec")
+            jwt_codec = (HS256Codec(), TokenExpiredError)
+    return jwt_codec
+
+def generate_jwt_token(user_data: dict, now: datetime = None) -> str:
+    """Generate a signed HS256 JWT for the user"""
+    if now is None:
+        now = datetime.utcnow()
+    payload = {
+        'sub': user_data['user_id'],
+        'ut': user_data['user_type'],
+        'exp': calendar.timegm(now.utctimetuple()) + TOKEN_LIFETIME_SECONDS
     }
+    signing_input = JWT_HEADER_SEGMENT + b'.' + base64url(to_json(payload).encode('utf-8'))
+    signature = jwt_signer.copy()
+    signature.update(signing_input)
+    return (signing_input + b'.' + base64url(signature.digest())).decode('ascii')
+
+def get_cached_token(key: int):
+    """Return a cached verification result if it has not expired"""
+    with token_cache_lock:
+        entry = token_cache.get(key)
+        if entry is None:
+            return None
+        result, expires_at = entry
+        if expires_at <= time.monotonic():
+            del token_cache[key]
+            return None
+        token_cache.move_to_end(key)
+        return result
+
+def cache_token(key: int, result: dict, lifetime: float):
+    """Cache a valid verification result, evicting the least recently used entry"""
+    with token_cache_lock:
+        token_cache[key] = (result, time.monotonic() + lifetime)
+        token_cache.move_to_end(key)
+        if len(token_cache) > TOKEN_CACHE_SIZE:
+            token_cache.popitem(last=False)
+
+def get_user_profile(user_id: str) -> Optional[dict]:
+    """Return the response summary for a user, cached briefly, or None"""
+    with user_cache_lock:
+        entry = user_cache.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            user_cache.move_to_end(user_id)
+            return entry[0]
     
-    # Simple base64 encoding (not secure for production)
-    token_json = json.dumps(token_data)
-    token_bytes = token_json.encode('utf-8')
-    return base64.b64encode(token_bytes).decode('utf-8')
+    response = dynamodb_client.get_item(
+        TableName=users_table_name,
+        Key={'user_id': {'S': user_id}},
+        ProjectionExpression='user_id, email, #name, user_type, class_access, school_id, created_at',
+        ExpressionAttributeNames={'#name': 'name'}
+    )
+    if 'Item' not in response:
+        return None
+    profile = user_summary({k: deserializer.deserialize(v) for k, v in response['Item'].items()})
+    
+    with user_cache_lock:
+        user_cache[user_id] = (profile, time.monotonic() + USER_CACHE_TTL)
+        user_cache.move_to_end(user_id)
+        if len(user_cache) > USER_CACHE_SIZE:
+            user_cache.popitem(last=False)
+    return profile
 
-def verify_simple_token(token: str) -> dict:
-    """Verify simple token and return user data"""
+def verify_jwt_token(token: str) -> dict:
+    """Verify JWT signature and expiry and return user data"""
+    if (not TOKEN_MIN_LENGTH <= len(token) <= TOKEN_MAX_LENGTH
+            or token.count('.') != 2
+            or not TOKEN_CHARS.issuperset(token)):
+        return INVALID_TOKEN_RESULT
+    
+    key = int.from_bytes(hashlib.sha256(token.encode('utf-8')).digest()[:16], 'big')
+    cached = get_cached_token(key)
+    if cached is not None:
+        return cached
+    
+    codec, expired_error = get_jwt_codec()
     try:
-        # Decode base64 token
-        token_bytes = base64.b64decode(token.encode('utf-8'))
-        token_data = json.loads(token_bytes.decode('utf-8'))
-        
-        # Check if token is expired
-        exp_time = datetime.fromisoformat(token_data['exp'])
-        if exp_time < datetime.utcnow():
-            return {'valid': False, 'error': 'Token has expired'}
-        
-        return {'valid': True, 'user': token_data}
-        
+        token_data = codec.decode(token, TOKEN_SECRET, algorithms=JWT_ALGORITHMS)
+    except expired_error:
+        return {'valid': False, 'error': 'Token has expired'}
     except Exception as e:
         return {'valid': False, 'error': f'Invalid token: {str(e)}'}
+    
+    # Tokens issued before the compact payload use the long claim names
+    user = {
+        'user_id': token_data.get('sub', token_data.get('user_id')),
+        'user_type': token_data.get('ut', token_data.get('user_type')),
+        'exp': token_data['exp']
+    }
+    
+    # Only valid results are cached, and never beyond the token's own expiry
+    result = {'valid': True, 'user': user}
+    cache_token(key, result, min(TOKEN_CACHE_TTL, token_data['exp'] - time.time()))
+    return result
+
+# Routes keyed by the last two path segments (the path may carry a stage
+# prefix), each mapping HTTP method -> handler(table, body, event)
+ROUTES = {
+    ('auth', 'register'): {
+        'POST': lambda table, body, event: register_user(table, body)
+    },
+    ('register', 'batch'): {
+        'POST': lambda table, body, event: register_users_batch(table, body, event)
+    },
+    ('auth', 'login'): {
+        'POST': lambda table, body, event: login_user(table, body)
+    },
+    ('auth', 'verify'): {
+        'GET': lambda table, body, event: verify_token(event)
+    }
+}
 
 def lambda_handler(event, context):
     """Main Lambda handler for authentication"""
+    global table_ready
+    
+    # Handle CORS preflight before any DynamoDB work
+    if event.get('httpMethod') == 'OPTIONS':
+        return OPTIONS_RESPONSE
+    
     try:
-        # Create users table if it doesn't exist
-        table = create_users_table_if_not_exists()
+        # Create users table if it doesn't exist - only checked once per
+        # container so warm invocations skip the DescribeTable round-trip
+        # (unless an index is missing)
+        if not table_ready or (index_recheck_at is not None and time.monotonic() >= index_recheck_at):
+            create_users_table_if_not_exists()
+            table_ready = True
+        table = users_table
         
         # Parse the request
         http_method = event.get('httpMethod', '')
         path = event.get('path', '')
-        body = event.get('body', '{}')
-        
-        print(f"DEBUG: HTTP Method: {http_method}")
-        print(f"DEBUG: Path: {path}")
-        print(f"DEBUG: Body: {body}")
         
-        if body:
-            try:
-                body = json.loads(body)
-            except json.JSONDecodeError:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-                        'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS'
-                    },
-                    'body': json.dumps({'error': 'Invalid JSON in request body'})
-                }
+        logger.debug("HTTP Method: %s", http_method)
+        logger.debug("Path: %s", path)
+        logger.debug("Body: %s", event.get('body'))
         
-        # Handle CORS preflight
-        if http_method == 'OPTIONS':
+        try:
+            body = parse_body(event)
+        except ValueError:
             return {
-                'statusCode': 200,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-                    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS'
-                },
-                'body': ''
+                'statusCode': 400,
+                'headers': CORS_HEADERS,
+                'body': INVALID_JSON_BODY
             }
         
         # Route requests
-        if http_method == 'POST' and '/auth/register' in path:
-            return register_user(table, body)
-        elif http_method == 'POST' and '/auth/login' in path:
-            return login_user(table, body)
-        elif http_method == 'GET' and '/auth/verify' in path:
-            return verify_token(event)
-        else:
+        route = ROUTES.get(tuple(path.strip('/').split('/')[-2:]), {})
+        handler = route.get(http_method)
+        if handler is None:
             return {
                 'statusCode': 404,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Endpoint not found'})
+                'headers': CORS_HEADERS,
+                'body': ENDPOINT_NOT_FOUND_BODY
             }
+        return handler(table, body, event)
     
     except Exception as e:
         print(f"ERROR: {str(e)}")
         return {
             'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps({'error': str(e)})
         }
 
+def validate_registration(user_data: dict) -> Optional[str]:
+    """Return an error message if the registration data is incomplete"""
+    # Validate required fields
+    for field in REQUIRED_REGISTRATION_FIELDS:
+        if field not in user_data:
+            return f'Missing required field: {field}'
+    
+    # For parents, phone_number is mandatory
+    if user_data['user_type'] == 'parent' and not user_data.get('phone_number'):
+        return 'Phone number is required for parents'
+    
+    return None
+
+def build_user_item(user_data: dict, password_hash: bytes, salt: bytes, current_time: str) -> dict:
+    """Build the DynamoDB item for a new user"""
+    item = {
+        'user_id': str(uuid.uuid4()),
+        'email': user_data['email'].lower().strip(),
+        'password_hash': password_hash,
+        'salt': salt,
+        'kdf': CURRENT_KDF,
+        'name': user_data['name'].strip(),
+        'user_type': user_data['user_type'],
+        'is_active': True,
+        'created_at': current_time,
+        'updated_at': current_time
+    }
+    
+    # Optional attributes are only stored when set and readers fall back to
+    # defaults (last_login is written by the phone login). phone_number is also
+    # a GSI key, which DynamoDB does not allow to be an empty string.
+    for field in ('class_access', 'school_id', 'phone_number'):
+        if user_data.get(field):
+            item[field] = user_data[field]
+    
+    return item
+
+def email_marker(item: dict) -> dict:
+    """Item that reserves a user's email; it has no email attribute, so it
+    stays out of the GSIs"""
+    return {'user_id': EMAIL_MARKER_PREFIX + item['email'], 'owner_id': item['user_id']}
+
+def backfill_email_markers():
+    """Write email markers for users registered before markers existed"""
+    scan_kwargs = {
+        'FilterExpression': 'attribute_exists(email)',
+        'ProjectionExpression': 'user_id, email'
+    }
+    written = 0
+    while True:
+        response = users_table.scan(**scan_kwargs)
+        for user in response.get('Items', []):
+            try:
+                users_table.put_item(
+                    Item=email_marker(user),
+                    ConditionExpression='attribute_not_exists(user_id)'
+                )
+                written += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                print(f"Email already claimed, skipping duplicate: {user['email']}")
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    print(f"Wrote {written} email markers")
+    return written
+
+def save_new_user(table, item: dict) -> bool:
+    """Save a new user and claim its email in one transaction.
+
+    Returns False if the email is already registered. Cancellations for any
+    other reason (throttling, a conflicting transaction) are re-raised.
+    """
+    try:
+        table.meta.client.transact_write_items(TransactItems=[
+            {'Put': {
+                'TableName': table.name,
+                'Item': item,
+                'ConditionExpression': 'attribute_not_exists(user_id)'
+            }},
+            {'Put': {
+                'TableName': table.name,
+                'Item': email_marker(item),
+                'ConditionExpression': 'attribute_not_exists(user_id)'
+            }}
+        ])
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        # Reasons are listed in TransactItems order: [user, email marker]
+        reasons = e.response.get('CancellationReasons', [])
+        if len(reasons) == 2 and reasons[1].get('Code') == 'ConditionalCheckFailed':
+            return False
+        raise
+    return True
+
+def user_summary(item: dict) -> dict:
+    """User data for responses (without sensitive info)"""
+    return {
+        'user_id': item['user_id'],
+        'email': item['email'],
+        'name': item['name'],
+        'user_type': item['user_type'],
+        'class_access': item.get('class_access', []),
+        'school_id': item.get('school_id', ''),
+        'created_at': item['created_at']
+    }
+
 def register_user(table, user_data):
     """Register a new user"""
     try:
-        # Validate required fields
-        required_fields = ['email', 'password', 'name', 'user_type']
-        for field in required_fields:
-            if field not in user_data:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'error': f'Missing required field: {field}'})
-                }
-        
-        # For parents, phone_number is mandatory
-        if user_data['user_type'] == 'parent' and not user_data.get('phone_number'):
+        error = validate_registration(user_data)
+        if error:
             return {
                 'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Phone number is required for parents'})
+                'headers': CORS_HEADERS,
+                'body': json.dumps({'error': error})
             }
         
-        # Generate unique user ID and hash password
-        user_id = str(uuid.uuid4())
+        # Hash password and prepare user item
         password_hash, salt = hash_password(user_data['password'])
-        current_time = datetime.utcnow().isoformat()
-        
-        # Prepare user item
-        item = {
-            'user_id': user_id,
-            'email': user_data['email'].lower().strip(),
-            'password_hash': password_hash,
-            'salt': salt,
-            'name': user_data['name'].strip(),
-            'user_type': user_data['user_type'],
-            'class_access': user_data.get('class_access', []),
-            'school_id': user_data.get('school_id', ''),
-            'phone_number': user_data.get('phone_number', ''),  # Add phone number field
-            'is_active': True,
-            'created_at': current_time,
-            'updated_at': current_time,
-            'last_login': None
-        }
+        now = datetime.utcnow()
+        item = build_user_item(user_data, password_hash, salt, now.isoformat())
         
-        # Save to DynamoDB
-        table.put_item(Item=item)
-        
-        # Generate simple token
-        token = generate_simple_token(item)
+        if not save_new_user(table, item):
+            return {
+                'statusCode': 409,
+                'headers': CORS_HEADERS,
+                'body': EMAIL_EXISTS_BODY
+            }
         
-        # Return user data (without sensitive info)
-        user_response = {
-            'user_id': user_id,
-            'email': item['email'],
-            'name': item['name'],
-            'user_type': item['user_type'],
-            'class_access': item['class_access'],
-            'school_id': item['school_id'],
-            'created_at': current_time
-        }
+        # Generate auth token
+        token = generate_jwt_token(item, now)
         
         return {
             'statusCode': 201,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'user': user_response,
+            'headers': CORS_HEADERS,
+            'body': to_json({
+                'user': user_summary(item),
                 'token': token,
                 'message': 'User registered successfully'
-            }, cls=DecimalEncoder)
+            })
         }
     
     except Exception as e:
         print(f"Registration error: {str(e)}")
         return {
             'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps({'error': str(e)})
         }
 
+def register_users_batch(table, body, event):
+    """Register many users at once (admin bulk import)"""
+    try:
+        # The role is checked against the stored user, not the token's claim
+        result = verify_jwt_token(get_bearer_token(event))
+        profile = get_user_profile(result['user']['user_id']) if result['valid'] else None
+        if profile is None or profile['user_type'] != 'admin':
+            return {
+                'statusCode': 403,
+                'headers': CORS_HEADERS,
+                'body': ADMIN_REQUIRED_BODY
+            }
+        
+        users = body.get('users') if isinstance(body, dict) else None
+        if not users:
+            return {
+                'statusCode': 400,
+                'headers': CORS_HEADERS,
+                'body': NO_USERS_BODY
+            }
+        
+        # Validate every user before hashing or writing anything
+        for index, user_data in enumerate(users):
+            error = validate_registration(user_data)
+            if error:
+                return {
+                    'statusCode': 400,
+                    'headers': CORS_HEADERS,
+                    'body': json.dumps({'error': f'User {index}: {error}'})
+                }
+        
+        # Rows repeating an earlier row's email are rejected before any hashing
+        rejected = []
+        pending = []
+        seen_emails = set()
+        for index, user_data in enumerate(users):
+            email = user_data['email'].lower().strip()
+            if email in seen_emails:
+                rejected.append({'index': index, 'email': email, 'error': DUPLICATE_IN_BATCH_ERROR})
+            else:
+                seen_emails.add(email)
+                pending.append((index, email, user_data))
+        
+        # Each user is hashed and saved with its email marker in one conditional
+        # transaction, so existing emails are never overwritten. The KDF releases
+        # the GIL and the client is thread-safe, so users are handled in parallel.
+        current_time = datetime.utcnow().isoformat()
+        with ThreadPoolExecutor(max_workers=min(len(pending), KDF_MAX_WORKERS)) as executor:
+            results = list(executor.map(
+                lambda entry: register_batch_user(table, entry[2], current_time), pending))
+        
+        items = []
+        for (index, email, _), (item, error) in zip(pending, results):
+            if error:
+                rejected.append({'index': index, 'email': email, 'error': error})
+            else:
+                items.append(item)
+        rejected.sort(key=lambda row: row['index'])
+        
+        # 409 only when every row was refused for its email; rows that failed
+        # for any other reason (throttling, a service error) make it 207 or 500
+        if not rejected:
+            status_code = 201
+        elif items:
+            status_code = 207
+        elif all(row['error'] in DUPLICATE_EMAIL_ERRORS for row in rejected):
+            status_code = 409
+        else:
+            status_code = 500
+        
+        return {
+            'statusCode': status_code,
+            'headers': CORS_HEADERS,
+            'body': to_json({
+                'users': [user_summary(item) for item in items],
+                'rejected': rejected,
+                'message': f'{len(items)} users registered successfully, {len(rejected)} rejected'
+            })
+        }
+    
+    except Exception as e:
+        print(f"Batch registration error: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def register_batch_user(table, user_data: dict, current_time: str) -> tuple:
+    """Hash and save one bulk-import user, returning (item, None) or (None, error)"""
+    password_hash, salt = hash_password(user_data['password'])
+    item = build_user_item(user_data, password_hash, salt, current_time)
+    try:
+        if not save_new_user(table, item):
+            return None, EMAIL_EXISTS_ERROR
+    except ClientError as e:
+        return None, e.response['Error'].get('Message') or e.response['Error']['Code']
+    return item, None
+
 def login_user(table, login_data):
     """Authenticate user with email/password or phone-only (for parents)"""
     try:
@@ -302,47 +852,46 @@ def login_user(table, login_data):
         if 'email' not in login_data or 'password' not in login_data:
             return {
                 'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Email and password are required for standard login, or phone_number for parent login'})
+                'headers': CORS_HEADERS,
+                'body': LOGIN_FIELDS_REQUIRED_BODY
             }
         
         email = login_data['email'].lower().strip()
         password = login_data['password']
         
         # Find user by email
-        response = table.query(
-            IndexName='email-index',
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('email').eq(email)
-        )
+        user = find_user('email-index', 'email', email, EMAIL_LOGIN_ATTRIBUTES)
         
-        if not response['Items']:
+        if user is None:
+            # Spend the same KDF work as a real check so response time does not
+            # reveal whether the email is registered
+            hash_password(password)
             return {
                 'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Invalid email or password'})
+                'headers': CORS_HEADERS,
+                'body': INVALID_CREDENTIALS_BODY
             }
         
-        user = response['Items'][0]
-        
         # Verify password
-        if not verify_password(password, user['password_hash'], user['salt']):
+        kdf = user.get('kdf', KDF_PBKDF2)
+        if not verify_password(password, user['password_hash'], user['salt'], kdf):
             return {
                 'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Invalid email or password'})
+                'headers': CORS_HEADERS,
+                'body': INVALID_CREDENTIALS_BODY
             }
         
-        # Generate simple token
-        token = generate_simple_token(user)
+        # Generate auth token
+        now = datetime.utcnow()
+        now_iso = now.isoformat()
+        token = generate_jwt_token(user, now)
+        
+        # Stamp last_login, lazily migrating older hashes in the same write now
+        # that we have the plaintext. The write stays inline: the container may
+        # be frozen as soon as the handler returns, and a migrated hash must not
+        # be dropped with a write left on a background thread.
+        needs_rehash = kdf != CURRENT_KDF or isinstance(user['password_hash'], str)
+        record_login(table, user['user_id'], now_iso, password if needs_rehash else None)
         
         # Return user data (without sensitive info)
         user_response = {
@@ -352,33 +901,55 @@ def login_user(table, login_data):
             'user_type': user['user_type'],
             'class_access': user.get('class_access', []),
             'school_id': user.get('school_id', ''),
-            'last_login': datetime.utcnow().isoformat()
+            'last_login': now_iso
         }
         
         return {
             'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
+            'headers': CORS_HEADERS,
+            'body': to_json({
                 'user': user_response,
                 'token': token,
                 'message': 'Login successful'
-            }, cls=DecimalEncoder)
+            })
         }
     
     except Exception as e:
         print(f"Login error: {str(e)}")
         return {
             'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps({'error': str(e)})
         }
 
+def record_login(table, user_id: str, login_time: str, rehash_password: Optional[str] = None) -> bool:
+    """Stamp last_login on an existing user.
+
+    When rehash_password is given, the password is re-hashed with the current
+    KDF and stored in the same UpdateItem. Returns False if the write fails,
+    which does not fail the login.
+    """
+    try:
+        update_expression = 'SET last_login = :login_time'
+        values = {':login_time': login_time}
+        if rehash_password is not None:
+            password_hash, salt = hash_password(rehash_password)
+            update_expression += ', password_hash = :hash, salt = :salt, kdf = :kdf'
+            values.update({':hash': password_hash, ':salt': salt, ':kdf': CURRENT_KDF})
+        
+        table.update_item(
+            Key={'user_id': user_id},
+            UpdateExpression=update_expression,
+            ConditionExpression='attribute_exists(user_id)',
+            ExpressionAttributeValues=values,
+            ReturnValues='NONE'
+        )
+        return True
+    except Exception as e:
+        # Don't fail the login if we can't update last login time
+        print(f"Failed to record login: {str(e)}")
+        return False
+
 def phone_login_user(table, login_data):
     """Authenticate user with phone number only (for parent app)"""
     try:
@@ -386,120 +957,68 @@ def phone_login_user(table, login_data):
         if 'phone_number' not in login_data:
             return {
                 'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Phone number is required'})
+                'headers': CORS_HEADERS,
+                'body': PHONE_REQUIRED_BODY
             }
         
         phone_number = login_data['phone_number'].strip()
         
         # Clean phone number (remove any formatting)
-        clean_phone = ''.join(filter(str.isdigit, phone_number))
+        clean_phone = PHONE_NON_DIGITS.sub('', unicodedata.normalize('NFKC', phone_number))
         
         # Validate phone number format (10 digits or 11 with country code)
         if len(clean_phone) not in [10, 11]:
             return {
                 'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Invalid phone number format'})
+                'headers': CORS_HEADERS,
+                'body': INVALID_PHONE_BODY
             }
         
         # Normalize to 10 digits (remove country code if present)
         if len(clean_phone) == 11 and clean_phone.startswith('1'):
             clean_phone = clean_phone[1:]
         
-        # Search for user by phone number
-        # Since we don't have a phone number index, we'll scan the table
-        # In production, you should add a GSI on phone_number for better performance
+        # Find user by phone number
         try:
-            response = table.scan(
-                FilterExpression='phone_number = :phone',
-                ExpressionAttributeValues={':phone': clean_phone}
-            )
+            user = find_user('phone-index', 'phone_number', clean_phone, PHONE_LOGIN_ATTRIBUTES)
         except Exception as e:
-            # If phone_number attribute doesn't exist, try alternative approaches
-            print(f"Phone number scan failed: {str(e)}")
-            # For now, we'll check if the phone number matches any user_id or email pattern
-            # This is a fallback - in production you should have phone_number as a proper field
+            print(f"Phone number query failed: {str(e)}")
             return {
                 'statusCode': 404,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'message': 'Phone number not found. Please contact your school administrator to register your phone number.',
-                    'error': 'PHONE_NOT_REGISTERED'
-                })
+                'headers': CORS_HEADERS,
+                'body': PHONE_NOT_REGISTERED_BODY
             }
         
-        users = response.get('Items', [])
-        
-        if not users:
+        if user is None:
             return {
                 'statusCode': 404,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'message': 'Phone number not found. Please contact your school administrator to register your phone number.',
-                    'error': 'PHONE_NOT_FOUND'
-                })
+                'headers': CORS_HEADERS,
+                'body': PHONE_NOT_FOUND_BODY
             }
         
-        user = users[0]  # Take the first match
-        
         # Verify this is a parent user
         if user.get('user_type') != 'parent':
             return {
                 'statusCode': 403,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'message': 'This phone number is not registered for parent access.',
-                    'error': 'NOT_PARENT_USER'
-                })
+                'headers': CORS_HEADERS,
+                'body': NOT_PARENT_USER_BODY
             }
         
         # Check if user is active
         if not user.get('is_active', True):
             return {
                 'statusCode': 403,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'message': 'This account has been deactivated. Please contact your school administrator.',
-                    'error': 'ACCOUNT_DEACTIVATED'
-                })
+                'headers': CORS_HEADERS,
+                'body': ACCOUNT_DEACTIVATED_BODY
             }
         
-        # Generate simple token
-        token = generate_simple_token(user)
+        # Generate auth token
+        now = datetime.utcnow()
+        now_iso = now.isoformat()
+        token = generate_jwt_token(user, now)
         
         # Update last login time
-        try:
-            table.update_item(
-                Key={'user_id': user['user_id']},
-                UpdateExpression='SET last_login = :login_time',
-                ExpressionAttributeValues={':login_time': datetime.utcnow().isoformat()}
-            )
-        except Exception as e:
-            print(f"Failed to update last login: {str(e)}")
-            # Don't fail the login if we can't update last login time
+        record_login(table, user['user_id'], now_iso)
         
         # Return user data (without sensitive info)
         user_response = {
@@ -509,77 +1028,69 @@ def phone_login_user(table, login_data):
             'user_type': user['user_type'],
             'class_access': user.get('class_access', []),
             'school_id': user.get('school_id', ''),
-            'last_login': datetime.utcnow().isoformat()
+            'last_login': now_iso
         }
         
         return {
             'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
+            'headers': CORS_HEADERS,
+            'body': to_json({
                 'success': True,
                 'user': user_response,
                 'token': token,
                 'message': 'Login successful'
-            }, cls=DecimalEncoder)
+            })
         }
     
     except Exception as e:
         print(f"Phone login error: {str(e)}")
         return {
             'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': False,
-                'error': 'Internal server error',
-                'message': 'An error occurred during login. Please try again.'
-            })
+            'headers': CORS_HEADERS,
+            'body': PHONE_LOGIN_ERROR_BODY
         }
 
+def get_bearer_token(event) -> str:
+    """Return the token from the Authorization header, or '' if there is none"""
+    headers = event.get('headers') or {}
+    auth_header = headers.get('Authorization', '') or headers.get('authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return ''
+    return auth_header[7:]  # Remove 'Bearer ' prefix
+
 def verify_token(event):
     """Verify token and return user data"""
     try:
-        # Get token from Authorization header
-        headers = event.get('headers', {})
-        auth_header = headers.get('Authorization', '') or headers.get('authorization', '')
-        
-        if not auth_header.startswith('Bearer '):
+        token = get_bearer_token(event)
+        if not token:
             return {
                 'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'No token provided'})
+                'headers': CORS_HEADERS,
+                'body': NO_TOKEN_BODY
             }
         
-        token = auth_header[7:]  # Remove 'Bearer ' prefix
-        result = verify_simple_token(token)
+        result = verify_jwt_token(token)
         
         if result['valid']:
+            profile = get_user_profile(result['user']['user_id'])
+            if profile is None:
+                return {
+                    'statusCode': 401,
+                    'headers': CORS_HEADERS,
+                    'body': USER_NOT_FOUND_BODY
+                }
             return {
                 'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
+                'headers': CORS_HEADERS,
+                'body': to_json({
                     'valid': True,
-                    'user': result['user']
+                    'user': profile
                 })
             }
         else:
             return {
                 'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
+                'headers': CORS_HEADERS,
                 'body': json.dumps({
                     'valid': False,
                     'error': result['error']
@@ -590,9 +1101,6 @@ def verify_token(event):
         print(f"Verify token error: {str(e)}")
         return {
             'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps({'error': str(e)})
         }
\ No newline at end of file
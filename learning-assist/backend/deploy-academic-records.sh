@@ -21,11 +21,23 @@ echo ""
 echo "Step 1: Creating deployment package..."
 cd "$(dirname "$0")"
 
-# Remove old zip if exists
+# Remove old zip and package directory if they exist
 rm -f $ZIP_FILE
+rm -rf academic-records-package
+mkdir -p academic-records-package
 
-# Create zip with Lambda function
-zip -r $ZIP_FILE academic_records_lambda_function.py
+# Bundle orjson (Linux wheel) for faster JSON; the function falls back to
+# the stdlib json module if this step fails. Keep the pin in step with
+# requirements.txt
+pip3 install orjson==3.9.10 -t academic-records-package/ --quiet \
+    --platform manylinux2014_x86_64 --only-binary=:all: --python-version 3.9 \
+    || echo "⚠ Could not bundle orjson - using stdlib json"
+
+# Create zip with Lambda function and bundled dependencies
+cp academic_records_lambda_function.py academic-records-package/
+cp json_codec.py academic-records-package/
+(cd academic-records-package && zip -r -q ../$ZIP_FILE .)
+rm -rf academic-records-package
 
 # Add boto3 dependencies (if not using Lambda's built-in)
 # Uncomment if you need specific boto3 version
@@ -75,7 +87,15 @@ else
 fi
 
 echo ""
-echo "Step 4: Getting function details..."
+echo "Step 4: Migrating existing table to the current schema..."
+# Adds GSIs that tables created by older versions lack; safe to re-run.
+# Runs after the code update so records written meanwhile use the new schema.
+python3 migrate_academic_records.py
+
+echo "✓ Table schema up to date"
+
+echo ""
+echo "Step 5: Getting function details..."
 FUNCTION_ARN=$(aws lambda get-function --function-name $FUNCTION_NAME --region $REGION --query 'Configuration.FunctionArn' --output text)
 
 echo "✓ Function ARN: $FUNCTION_ARN"
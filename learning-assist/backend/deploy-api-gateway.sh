@@ -179,6 +179,7 @@ elif [[ "$API_TYPE" == "HTTP" ]]; then
 
   log "Creating HTTP routes - Auth"
   add_route "POST" "/auth/register"
+  add_route "POST" "/auth/register/batch"
   add_route "POST" "/auth/login"
   add_route "GET"  "/auth/verify"
   add_route "GET"  "/auth/user/{id}"
@@ -61,11 +61,24 @@ mkdir -p auth-temp
 
 # Copy the Lambda function
 cp auth_lambda_function.py auth-temp/
+cp json_codec.py auth-temp/
+
+# Bundle PyJWT (required for token signing; HS256 needs no cryptography wheel)
+debug "Bundling PyJWT..."
+pip3 install PyJWT==2.8.0 -t auth-temp/ --quiet
+
+# Bundle orjson (Linux wheel) for faster JSON; the function falls back to
+# the stdlib json module if this step fails. Keep the pin in step with
+# requirements.txt
+debug "Bundling orjson..."
+pip3 install orjson==3.9.10 -t auth-temp/ --quiet \
+    --platform manylinux2014_x86_64 --only-binary=:all: --python-version 3.11 \
+    || warn "Could not bundle orjson - using stdlib json"
 
 # Create the zip package
 debug "Packaging Lambda function..."
 cd auth-temp
-zip -q ../auth-lambda.zip auth_lambda_function.py
+zip -r -q ../auth-lambda.zip .
 cd ..
 rm -rf auth-temp
 
@@ -113,6 +126,10 @@ else
     log "✅ Auth Lambda function created"
 fi
 
+# Add GSIs that users tables created by older versions lack; safe to re-run
+log "Migrating users table to the current schema..."
+python3 migrate_users_table.py
+
 # Verify deployment
 log "Verifying deployment..."
 FUNCTION_INFO=$(aws lambda get-function --function-name $AUTH_FUNCTION_NAME --query 'Configuration.{Name:FunctionName,Runtime:Runtime,State:State,Size:CodeSize}' --output text)
@@ -150,23 +167,8 @@ echo ""
 echo -e "${GREEN}Security:${NC}"
 echo "  JWT Secret: $JWT_SECRET"
 echo ""
-echo -e "${YELLOW}⚠️  Dependencies Note:${NC}"
-echo "The function is deployed without PyJWT/cryptography dependencies."
-echo "To add dependencies, choose one of these options:"
-echo ""
-echo -e "${BLUE}Option 1 - Lambda Console:${NC}"
-echo "1. Go to: https://console.aws.amazon.com/lambda/home?region=$AWS_REGION#/functions/$AUTH_FUNCTION_NAME"
-echo "2. Upload a new deployment package with dependencies"
-echo ""
-echo -e "${BLUE}Option 2 - Use Lambda Layer:${NC}"
-echo "1. Create a layer with PyJWT and cryptography"
-echo "2. Attach the layer to this function"
-echo ""
-echo -e "${BLUE}Option 3 - Manual pip install:${NC}"
-echo "pip3 install PyJWT cryptography -t temp_package/"
-echo "cp auth_lambda_function.py temp_package/"
-echo "cd temp_package && zip -r ../auth-with-deps.zip . && cd .."
-echo "aws lambda update-function-code --function-name $AUTH_FUNCTION_NAME --zip-file fileb://auth-with-deps.zip"
+echo -e "${GREEN}Dependencies:${NC}"
+echo "  PyJWT bundled in the deployment package (orjson too, when available)"
 echo ""
 echo -e "${GREEN}Configuration saved to:${NC} auth-deployment.env"
 echo ""
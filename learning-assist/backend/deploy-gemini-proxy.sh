@@ -78,6 +78,7 @@ rm -f gemini-lambda.zip
 # Create temporary directory for package
 mkdir -p gemini-package
 cp gemini_lambda_function.py gemini-package/lambda_function.py
+cp json_codec.py gemini-package/
 
 # Install dependencies
 cd gemini-package
@@ -92,6 +93,14 @@ else
     echo "On Ubuntu: apt-get install python3-pip"
     exit 1
 fi
+
+# Bundle orjson (Linux wheel) for faster JSON; the function falls back to
+# the stdlib json module if this step fails. Keep the pin in step with
+# requirements.txt
+PIP=$(command -v pip3 || command -v pip)
+"$PIP" install orjson==3.9.10 -t . --quiet \
+    --platform manylinux2014_x86_64 --only-binary=:all: --python-version 3.9 \
+    || echo -e "${YELLOW}⚠️  Could not bundle orjson - using stdlib json${NC}"
 cd ..
 
 # Create zip file
@@ -150,6 +159,32 @@ else
     echo -e "${GREEN}✅ Usage tracking table already exists${NC}"
 fi
 
+# Create DynamoDB table for daily rate-limit counters, kept apart from the
+# per-call usage records
+RATE_TABLE_NAME="learning_assist_gemini_rate_limits"
+
+if ! aws dynamodb describe-table --table-name $RATE_TABLE_NAME > /dev/null 2>&1; then
+    echo "📊 Creating rate limit table..."
+    aws dynamodb create-table \
+        --table-name $RATE_TABLE_NAME \
+        --attribute-definitions \
+            AttributeName=rate_key,AttributeType=S \
+        --key-schema \
+            AttributeName=rate_key,KeyType=HASH \
+        --billing-mode PAY_PER_REQUEST > /dev/null
+    
+    echo "⏳ Waiting for table to become active..."
+    aws dynamodb wait table-exists --table-name $RATE_TABLE_NAME
+    echo -e "${GREEN}✅ Rate limit table created${NC}"
+else
+    echo -e "${GREEN}✅ Rate limit table already exists${NC}"
+fi
+
+# Daily rate-limit counters carry an expires_at epoch; let DynamoDB delete them
+aws dynamodb update-time-to-live \
+    --table-name $RATE_TABLE_NAME \
+    --time-to-live-specification Enabled=true,AttributeName=expires_at > /dev/null 2>&1 || true
+
 # Get API Gateway ID
 API_ID=$(aws apigateway get-rest-apis --query "items[?name=='learning-assist-api'].id" --output text)
 
@@ -59,11 +59,12 @@ mkdir -p topics-temp
 
 # Copy the Lambda function
 cp lambda_function.py topics-temp/
+cp json_codec.py topics-temp/
 
 # Create the zip package
 debug "Packaging Lambda function..."
 cd topics-temp
-zip -q ../topics-lambda.zip lambda_function.py
+zip -q ../topics-lambda.zip lambda_function.py json_codec.py
 cd ..
 rm -rf topics-temp
 
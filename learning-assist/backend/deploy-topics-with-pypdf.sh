@@ -13,8 +13,17 @@ mkdir -p topics-lambda-package
 echo "Installing PyPDF2..."
 pip install PyPDF2==3.0.1 -t topics-lambda-package/ --quiet
 
+# Bundle orjson (Linux wheel) for faster JSON; the function falls back to
+# the stdlib json module if this step fails. Keep the pin in step with
+# requirements.txt
+echo "Installing orjson..."
+pip install orjson==3.9.10 -t topics-lambda-package/ --quiet \
+  --platform manylinux2014_x86_64 --only-binary=:all: --python-version 3.11 \
+  || echo "⚠️  Could not bundle orjson - using stdlib json"
+
 # Copy Lambda function
 cp lambda_function.py topics-lambda-package/
+cp json_codec.py topics-lambda-package/
 
 # Create zip
 echo "Creating deployment package..."
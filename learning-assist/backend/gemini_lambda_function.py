@@ -1,12 +1,16 @@
 import json
-from math import log
 import os
+import calendar
 import boto3
+from botocore.config import Config
 import requests
+from urllib3.util.retry import Retry
 from datetime import datetime
-import uuid
+import secrets
 import logging
 import sys
+import time
+from json_codec import to_json, from_json, parse_body
 
 # Configure logging
 logger = logging.getLogger()
@@ -19,10 +23,24 @@ if not logger.handlers:
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
+# Keep connections to DynamoDB alive between calls and warm invocations so
+# usage reads and writes skip the TCP/TLS handshake; short timeouts keep a
+# stalled bookkeeping call from holding up the AI response
+boto_config = Config(
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+    max_pool_connections=10,
+    connect_timeout=5,
+    read_timeout=10
+)
+
 # Initialize DynamoDB
 # Assume 'learning_assist_gemini_usage' exists and is configured correctly
-dynamodb = boto3.resource('dynamodb')
+dynamodb = boto3.resource('dynamodb', config=boto_config)
 usage_table = dynamodb.Table('learning_assist_gemini_usage')
+# Daily rate-limit counters live in their own table so scans of the usage
+# table only ever see per-call usage records
+rate_limit_table = dynamodb.Table('learning_assist_gemini_rate_limits')
 
 # API configuration
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
@@ -33,38 +51,99 @@ CLAUDE_API_BASE_URL = 'https://api.anthropic.com/v1/messages'
 # CRITICAL FIX: Set timeout to be less than the 80s API Gateway timeout.
 REQUEST_TIMEOUT = 80
 
+# Connects get their own short timeout, so the retried connects below add at
+# most ~10s (3 attempts plus backoff) before the request is even sent, instead
+# of up to REQUEST_TIMEOUT each
+CONNECT_TIMEOUT = 3.05
+HTTP_TIMEOUT = (CONNECT_TIMEOUT, REQUEST_TIMEOUT)
+
+# One session per container so warm invocations reuse the TLS connections to
+# the Gemini and Claude APIs instead of handshaking on every call. Only failed
+# connects are retried: a generation request that reached the provider is never
+# sent twice, and status retries would eat into the API Gateway time budget.
+http_session = requests.Session()
+http_session.mount('https://', requests.adapters.HTTPAdapter(
+    pool_connections=2,
+    pool_maxsize=10,
+    max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+))
+
+# Requests per user per UTC day, counted in one <user>#<date> item in the rate
+# limit table; counters expire via the expires_at TTL attribute
+MAX_DAILY_REQUESTS = 1000
+RATE_COUNTER_TTL_SECONDS = 2 * 24 * 60 * 60
+
+# Warm containers count requests locally for up to RATE_CACHE_TTL seconds and
+# add them to the shared counter on the next refresh, as long as the total
+# stays under RATE_CACHE_HEADROOM of the limit. Entries are
+# (user_id, date) -> [last shared count, unsent increments, refreshed at].
+RATE_CACHE_TTL = 30  # seconds
+RATE_CACHE_HEADROOM = 0.9
+rate_cache = {}
+
+# Proxy paths served by handle_ai_proxy
+ALLOWED_ENDPOINTS = frozenset(['generate-content', 'discover-documents', 'enhance-section', 'analyze-chapter'])
+
 # Supported models
 SUPPORTED_MODELS = {
     'gemini-2.5-pro': 'gemini',
     'claude-3-5-sonnet-20241022': 'claude'
 }
 
+# Upstream URLs and request headers, built once per container. Every proxy
+# path maps to generateContent on the requested Gemini model.
+GEMINI_MODEL_URLS = {
+    model: f"{GEMINI_API_BASE_URL}/{model}:generateContent"
+    for model, provider in SUPPORTED_MODELS.items() if provider == 'gemini'
+}
+GEMINI_REQUEST_HEADERS = {'Content-Type': 'application/json'}
+GEMINI_REQUEST_PARAMS = {'key': GEMINI_API_KEY}
+CLAUDE_REQUEST_HEADERS = {
+    'Content-Type': 'application/json',
+    'x-api-key': CLAUDE_API_KEY,
+    'anthropic-version': '2023-06-01'
+}
+
+# Shared response headers and fixed bodies, built once per container
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization,authorization',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+}
+OPTIONS_RESPONSE = {'statusCode': 200, 'headers': CORS_HEADERS, 'body': ''}
+NO_API_KEYS_BODY = json.dumps({'error': 'No API keys configured on server'})
+INVALID_JSON_BODY = json.dumps({'error': 'Invalid JSON in request body'})
+ENDPOINT_NOT_FOUND_BODY = json.dumps({'error': 'Endpoint not found'})
+GENERATION_FAILED_BODY = json.dumps({'error': 'Failed to generate content'})
+REQUEST_TIMEOUT_BODY = json.dumps({'error': 'Request timeout'})
+GEMINI_KEY_MISSING_BODY = json.dumps({'error': 'Gemini API key not configured'})
+GEMINI_UNREACHABLE_BODY = json.dumps({'error': 'Failed to connect to Gemini API'})
+MAX_TOKENS_BODY = json.dumps({'error': 'Output token limit exceeded. Try a shorter prompt or reduce the complexity of your request.'})
+CLAUDE_KEY_MISSING_BODY = json.dumps({'error': 'Claude API key not configured'})
+CLAUDE_UNREACHABLE_BODY = json.dumps({'error': 'Failed to connect to Claude API'})
+
 # --- Utility Functions ---
 
 def lambda_handler(event, context):
     """
     Secure proxy for AI API calls with usage tracking and authentication
     """
-    headers = {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,Authorization,authorization',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-    }
+    headers = CORS_HEADERS
     
     try:
         if event.get('httpMethod') == 'OPTIONS':
             logger.info("Handling OPTIONS request")
-            return {'statusCode': 200, 'headers': headers, 'body': ''}
+            return OPTIONS_RESPONSE
         
         if not GEMINI_API_KEY and not CLAUDE_API_KEY:
             logger.error("No API keys configured")
-            return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': 'No API keys configured on server'})}
+            return {'statusCode': 500, 'headers': headers, 'body': NO_API_KEYS_BODY}
         
         try:
-            body = json.loads(event['body']) if event.get('body') else {}
-        except json.JSONDecodeError as e:
+            body = parse_body(event)
+        except ValueError as e:
             logger.error(f"Invalid JSON in request body: {str(e)}")
-            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'Invalid JSON in request body'})}
+            return {'statusCode': 400, 'headers': headers, 'body': INVALID_JSON_BODY}
         
         user_id = extract_user_from_token(event.get('headers', {}))
         logger.info(f"Request from user: {user_id}")
@@ -72,14 +151,11 @@ def lambda_handler(event, context):
         path = event.get('pathParameters', {}).get('proxy')
         logger.info(f"Routing to path: {path}")
 
-        # Use a list of allowed endpoints for cleaner routing
-        ALLOWED_ENDPOINTS = ['generate-content', 'discover-documents', 'enhance-section', 'analyze-chapter']
-
         if path in ALLOWED_ENDPOINTS:
             return handle_ai_proxy(path, body, user_id, headers)
         else:
             logger.warning(f"Unknown endpoint: {path}")
-            return {'statusCode': 404, 'headers': headers, 'body': json.dumps({'error': 'Endpoint not found'})}
+            return {'statusCode': 404, 'headers': headers, 'body': ENDPOINT_NOT_FOUND_BODY}
             
     except Exception as e:
         logger.error(f"Error in gemini proxy: {str(e)}", exc_info=True)
@@ -101,35 +177,55 @@ def extract_user_from_token(headers):
 
 def track_usage(user_id, endpoint, tokens_used=0):
     """Track API usage for billing and monitoring"""
+    # Written inline: a Lambda container may be frozen as soon as the handler
+    # returns, so a write left on a background thread or in a buffer can be lost
     try:
+        now = datetime.utcnow()
         # NOTE: Using 'usage_id' as PK and 'timestamp' for sorting/indexing is recommended.
         usage_table.put_item(Item={
-            'usage_id': str(uuid.uuid4()),
+            'usage_id': secrets.token_hex(16),
             'user_id': user_id,
             'endpoint': endpoint,
             'tokens_used': tokens_used,
-            'timestamp': datetime.utcnow().isoformat(),
-            'date': datetime.utcnow().strftime('%Y-%m-%d')
+            'timestamp': now.isoformat(),
+            'date': now.strftime('%Y-%m-%d')
         })
         logger.info(f"Usage tracked: {user_id} - {endpoint} - {tokens_used} tokens")
     except Exception as e:
         logger.warning(f"Failed to track usage: {str(e)}")
 
 def check_rate_limit(user_id):
-    """Check if user has exceeded rate limits (basic implementation using scan)"""
+    """Count this request against the user's daily limit with an atomic counter"""
     try:
-        today = datetime.utcnow().strftime('%Y-%m-%d')
+        now = datetime.utcnow()
+        today = now.strftime('%Y-%m-%d')
+        key = (user_id, today)
+        
+        entry = rate_cache.get(key)
+        if entry is None:
+            # Drop counts left over from previous days
+            for stale in [k for k in rate_cache if k[1] != today]:
+                del rate_cache[stale]
+        elif (time.monotonic() - entry[2] < RATE_CACHE_TTL
+                and entry[0] + entry[1] + 1 < MAX_DAILY_REQUESTS * RATE_CACHE_HEADROOM):
+            entry[1] += 1
+            return True, entry[0] + entry[1]
         
-        # NOTE: A 'scan' is inefficient for large tables. For production, 
-        # a DynamoDB GSI on 'date' or a more efficient query is recommended.
-        response = usage_table.scan(
-            FilterExpression='user_id = :uid AND #date = :today',
-            ExpressionAttributeNames={'#date': 'date'},
-            ExpressionAttributeValues={':uid': user_id, ':today': today}
+        # ADD creates the counter on first use and returns the new total, so no
+        # read of past usage is needed; locally counted requests go with it
+        response = rate_limit_table.update_item(
+            Key={'rate_key': f'{user_id}#{today}'},
+            UpdateExpression='ADD #count :increment SET expires_at = if_not_exists(expires_at, :expires_at)',
+            ExpressionAttributeNames={'#count': 'count'},
+            ExpressionAttributeValues={
+                ':increment': 1 + (entry[1] if entry else 0),
+                ':expires_at': calendar.timegm(now.date().timetuple()) + RATE_COUNTER_TTL_SECONDS
+            },
+            ReturnValues='UPDATED_NEW'
         )
-        daily_requests = len(response['Items'])
-        MAX_DAILY_REQUESTS = 1000
-        return daily_requests < MAX_DAILY_REQUESTS, daily_requests
+        daily_requests = int(response['Attributes']['count'])
+        rate_cache[key] = [daily_requests, 0, time.monotonic()]
+        return daily_requests <= MAX_DAILY_REQUESTS, daily_requests
     except Exception as e:
         logger.warning(f"Rate limit check failed: {str(e)}")
         return True, 0
@@ -151,7 +247,7 @@ def handle_ai_proxy(endpoint_name, body, user_id, headers):
             })
         }
     
-    logger.info(f"OriginalBody: {body}")
+    logger.debug("OriginalBody: %s", body)
     model = body.get('model', 'gemini-2.5-pro')
     
     if model not in SUPPORTED_MODELS:
@@ -182,7 +278,7 @@ def handle_ai_proxy(endpoint_name, body, user_id, headers):
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({'error': 'Failed to generate content'})
+            'body': GENERATION_FAILED_BODY
         }
 
 def handle_gemini_request(endpoint_name, body, user_id, headers, model):
@@ -191,33 +287,29 @@ def handle_gemini_request(endpoint_name, body, user_id, headers, model):
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({'error': 'Gemini API key not configured'})
+            'body': GEMINI_KEY_MISSING_BODY
         }
     
-    # Map proxy path to Gemini model endpoint. Note: The external endpoint path is
-    # always 'generateContent' regardless of the custom internal path (e.g. 'discover-documents')
-    # unless the internal path directly maps to a different Gemini method (e.g. 'embedContent')
-    gemini_endpoint_path = f"{model}:generateContent" 
-    
     try:
-        # Remove model from body before sending to Gemini
-        gemini_body = {k: v for k, v in body.items() if k != 'model'}
-        
-        # Ensure 'generateContent' is used as the method in the URL path
-        # Note: If the user intended custom endpoints to map to other API methods (e.g., embedContent),
-        # this logic would need to be updated. Assuming all map to generateContent for now.
+        # Remove model from body before sending to Gemini. The body was parsed
+        # for this request alone, so it is trimmed in place rather than copied
+        body.pop('model', None)
         
-        gemini_response = requests.post(
-            f"{GEMINI_API_BASE_URL}/{gemini_endpoint_path}",
-            params={'key': GEMINI_API_KEY},
-            headers={'Content-Type': 'application/json'},
-            json=gemini_body,
-            timeout=REQUEST_TIMEOUT
+        # The external endpoint is always generateContent regardless of the custom
+        # internal path (e.g. 'discover-documents'); see GEMINI_MODEL_URLS
+        gemini_response = http_session.post(
+            GEMINI_MODEL_URLS[model],
+            params=GEMINI_REQUEST_PARAMS,
+            headers=GEMINI_REQUEST_HEADERS,
+            json=body,
+            timeout=HTTP_TIMEOUT
         )
         
         logger.info(f"Gemini API response status: {gemini_response.status_code}")
-        response_body = gemini_response.json()
-        logger.info(f"Gemini API response body: {response_body}")
+        # Parse once to read finishReason and usage; the raw bytes are what we return
+        raw_body = gemini_response.content
+        response_body = from_json(raw_body)
+        logger.debug("Gemini API response body: %s", raw_body)
         
         # Check for MAX_TOKENS error
         if gemini_response.status_code == 200 and 'candidates' in response_body and response_body['candidates'][0].get('finishReason') == 'MAX_TOKENS':
@@ -225,7 +317,7 @@ def handle_gemini_request(endpoint_name, body, user_id, headers, model):
             return {
                 'statusCode': 422,
                 'headers': headers,
-                'body': json.dumps({'error': 'Output token limit exceeded. Try a shorter prompt or reduce the complexity of your request.'})
+                'body': MAX_TOKENS_BODY
             }
         
         # Extract token usage
@@ -238,7 +330,7 @@ def handle_gemini_request(endpoint_name, body, user_id, headers, model):
         return {
             'statusCode': gemini_response.status_code,
             'headers': headers,
-            'body': json.dumps(response_body)
+            'body': raw_body.decode('utf-8')
         }
         
     except requests.exceptions.Timeout:
@@ -246,7 +338,7 @@ def handle_gemini_request(endpoint_name, body, user_id, headers, model):
         return {
             'statusCode': 504,
             'headers': headers,
-            'body': json.dumps({'error': 'Request timeout'})
+            'body': REQUEST_TIMEOUT_BODY
         }
     except requests.exceptions.RequestException as e:
         # This is the exception caught when the 502 error occurs in the logs
@@ -254,7 +346,14 @@ def handle_gemini_request(endpoint_name, body, user_id, headers, model):
         return {
             'statusCode': 502,
             'headers': headers,
-            'body': json.dumps({'error': 'Failed to connect to Gemini API'})
+            'body': GEMINI_UNREACHABLE_BODY
+        }
+    except ValueError as e:
+        logger.error(f"Gemini returned a non-JSON response: {str(e)}")
+        return {
+            'statusCode': 502,
+            'headers': headers,
+            'body': GEMINI_UNREACHABLE_BODY
         }
 
 def handle_claude_request(endpoint_name, body, user_id, headers, model):
@@ -263,21 +362,17 @@ def handle_claude_request(endpoint_name, body, user_id, headers, model):
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({'error': 'Claude API key not configured'})
+            'body': CLAUDE_KEY_MISSING_BODY
         }
     
     try:
         claude_body = convert_gemini_to_claude_format(body, model)
         
-        claude_response = requests.post(
+        claude_response = http_session.post(
             CLAUDE_API_BASE_URL,
-            headers={
-                'Content-Type': 'application/json',
-                'x-api-key': CLAUDE_API_KEY,
-                'anthropic-version': '2023-06-01'
-            },
+            headers=CLAUDE_REQUEST_HEADERS,
             json=claude_body,
-            timeout=REQUEST_TIMEOUT
+            timeout=HTTP_TIMEOUT
         )
         
         logger.info(f"Claude API response status: {claude_response.status_code}")
@@ -286,22 +381,19 @@ def handle_claude_request(endpoint_name, body, user_id, headers, model):
         if claude_response.status_code != 200:
             logger.error(f"Claude API error response: {claude_response.text}")
         
-        response_body = claude_response.json()
+        response_body = from_json(claude_response.content)
         
-        # Convert Claude response back to Gemini format
+        # Convert Claude response back to Gemini format; the conversion already
+        # totals the Claude input and output tokens
         gemini_format_response = convert_claude_to_gemini_format(response_body)
-        
-        # Extract token usage from the *original* Claude response for tracking
-        tokens_used = 0
-        if 'usage' in response_body:
-            tokens_used = response_body['usage'].get('input_tokens', 0) + response_body['usage'].get('output_tokens', 0)
+        tokens_used = gemini_format_response['usageMetadata']['totalTokenCount']
         
         track_usage(user_id, f"{endpoint_name}-{model}", tokens_used)
         
         return {
             'statusCode': claude_response.status_code,
             'headers': headers,
-            'body': json.dumps(gemini_format_response)
+            'body': to_json(gemini_format_response)
         }
         
     except requests.exceptions.Timeout:
@@ -309,31 +401,39 @@ def handle_claude_request(endpoint_name, body, user_id, headers, model):
         return {
             'statusCode': 504,
             'headers': headers,
-            'body': json.dumps({'error': 'Request timeout'})
+            'body': REQUEST_TIMEOUT_BODY
         }
     except requests.exceptions.RequestException as e:
         logger.error(f"Claude request network error: {str(e)}")
         return {
             'statusCode': 502,
             'headers': headers,
-            'body': json.dumps({'error': 'Failed to connect to Claude API'})
+            'body': CLAUDE_UNREACHABLE_BODY
+        }
+    except ValueError as e:
+        logger.error(f"Claude returned a non-JSON response: {str(e)}")
+        return {
+            'statusCode': 502,
+            'headers': headers,
+            'body': CLAUDE_UNREACHABLE_BODY
         }
 
 def convert_gemini_to_claude_format(gemini_body, model):
     """Convert Gemini API format to Claude API format"""
+    # Assuming the Gemini contents follow a simple user/model chat pattern.
+    # Claude only supports 'text' and 'image' parts, assuming only text for simplicity.
+    # Each text part becomes its own text block, and consecutive contents with the
+    # same role are merged into one message, since Claude requires turns to alternate.
     messages = []
-    if 'contents' in gemini_body:
-        # Assuming the Gemini contents follow a simple user/model chat pattern
-        for content in gemini_body['contents']:
-            role = 'user' if content.get('role', 'user') == 'user' else 'assistant'
-            # Claude only supports 'text' and 'image' parts, assuming only text for simplicity
-            if 'parts' in content:
-                for part in content['parts']:
-                    if 'text' in part:
-                        messages.append({
-                            'role': role,
-                            'content': part['text']
-                        })
+    for content in gemini_body.get('contents', ()):
+        role = 'user' if content.get('role', 'user') == 'user' else 'assistant'
+        blocks = [{'type': 'text', 'text': part['text']} for part in content.get('parts', ()) if part.get('text')]
+        if not blocks:
+            continue
+        if messages and messages[-1]['role'] == role:
+            messages[-1]['content'].extend(blocks)
+        else:
+            messages.append({'role': role, 'content': blocks})
     
     # Extract generation configuration
     generation_config = gemini_body.get('generationConfig', {})
@@ -349,6 +449,9 @@ def convert_gemini_to_claude_format(gemini_body, model):
     
     return claude_body
 
+# Claude stop_reason values that have their own Gemini finishReason
+CLAUDE_FINISH_REASONS = {'max_tokens': 'MAX_TOKENS'}
+
 def convert_claude_to_gemini_format(claude_response):
     """
     Convert Claude API response to Gemini API format.
@@ -359,12 +462,9 @@ def convert_claude_to_gemini_format(claude_response):
     if 'content' in claude_response and claude_response['content']:
         text_content = claude_response['content'][0].get('text', '')
         
-    # Determine finish reason based on Claude's stop_reason
-    finish_reason = 'STOP'
-    if 'stop_reason' in claude_response:
-        if claude_response['stop_reason'] == 'max_tokens':
-            finish_reason = 'MAX_TOKENS' # Match Gemini's finishReason
-        # Other stop reasons ('end_turn', 'stop_sequence') map logically to STOP
+    # Determine finish reason based on Claude's stop_reason; other stop reasons
+    # ('end_turn', 'stop_sequence') map logically to STOP
+    finish_reason = CLAUDE_FINISH_REASONS.get(claude_response.get('stop_reason'), 'STOP')
         
     # Extract token usage for consistency
     tokens_used = 0
@@ -0,0 +1,49 @@
+"""
+JSON helpers shared by the Lambda functions
+
+orjson (a C extension) is used when it is bundled with the function; the
+stdlib json fallback produces the same compact output. Each deploy script
+copies this module next to its handler.
+"""
+
+import json
+from decimal import Decimal
+from typing import Any
+
+# Use orjson (C extension) for JSON when it is packaged with the function
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def decimal_default(obj):
+    """JSON fallback to convert DynamoDB Decimal types"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def to_json(obj) -> str:
+    """Serialize a response body, preferring orjson when available"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, default=decimal_default).decode('utf-8')
+    return json.dumps(obj, default=decimal_default, separators=(',', ':'))
+
+
+def from_json(data):
+    """Parse a JSON payload, preferring orjson when available.
+
+    Malformed input raises ValueError (orjson's and json's decode errors both
+    subclass it).
+    """
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_body(event) -> Any:
+    """Parse an API Gateway event's body, or return {} when it has none"""
+    body = event.get('body')
+    return from_json(body) if body else {}
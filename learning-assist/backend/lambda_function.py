@@ -2,11 +2,19 @@ import json
 import boto3
 import uuid
 from datetime import datetime
-from decimal import Decimal
+from boto3.dynamodb.conditions import Key, Attr
 from botocore.exceptions import ClientError
 import time
 import base64
+import re
+import os
+import logging
 from io import BytesIO
+from json_codec import to_json
+
+# Request tracing is logged at DEBUG; set LOG_LEVEL=DEBUG on the function to see it
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'WARNING'))
 
 # Try to import PyPDF2 for server-side PDF extraction
 try:
@@ -20,12 +28,15 @@ except ImportError:
 dynamodb = boto3.resource('dynamodb')
 table_name = 'learning_assist_topics'
 
-class DecimalEncoder(json.JSONEncoder):
-    """Helper class to convert Decimal objects to float for JSON serialization"""
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+# Set once the table has been confirmed to exist in this container
+topics_table = None
+
+# Condition builders for the subject lookup, created once per container
+SUBJECT_KEY = Key('subject_id')
+SUBJECT_ATTR = Attr('subject_id')
+
+# Matches /topics and /topics/{id} (optionally behind a stage prefix) in one scan
+TOPICS_PATH_RE = re.compile(r'/topics(?:/(?P<topic_id>[^/]+))?/?$')
 
 def create_table_if_not_exists():
     """Create the DynamoDB table if it doesn't exist"""
@@ -162,9 +173,14 @@ def extract_pdf_text(pdf_base64_data):
 
 def lambda_handler(event, context):
     """Main Lambda handler"""
+    global topics_table
+    
     try:
-        # Create table if it doesn't exist
-        table = create_table_if_not_exists()
+        # Create table if it doesn't exist - only checked once per container
+        # so warm invocations skip the DescribeTable round-trip
+        if topics_table is None:
+            topics_table = create_table_if_not_exists()
+        table = topics_table
         
         # Parse the request - handle both proxy and non-proxy integration
         http_method = event.get('httpMethod', '') or event.get('requestContext', {}).get('httpMethod', '')
@@ -178,12 +194,12 @@ def lambda_handler(event, context):
                 http_method = request_context['http'].get('method', '')
                 path = request_context['http'].get('path', '')
         
-        # Debug logging
-        print(f"DEBUG: Full event keys: {list(event.keys())}")
-        print(f"DEBUG: HTTP Method: {http_method}")
-        print(f"DEBUG: Path: {path}")
-        print(f"DEBUG: Body: {body if body else 'None'}")  # Full body
-        print(f"DEBUG: Request Context: {event.get('requestContext', {})}")
+        # Debug logging (arguments are only formatted when DEBUG is enabled)
+        logger.debug("Full event keys: %s", list(event.keys()))
+        logger.debug("HTTP Method: %s", http_method)
+        logger.debug("Path: %s", path)
+        logger.debug("Body: %s", body if body else 'None')
+        logger.debug("Request Context: %s", event.get('requestContext', {}))
         
         if body:
             try:
@@ -215,12 +231,14 @@ def lambda_handler(event, context):
             }
         
         # Route requests based on HTTP method and path
-        if http_method == 'GET':
-            if '/topics/' in path:
+        route = TOPICS_PATH_RE.search(path)
+        topic_id = route.group('topic_id') if route else None
+        
+        if http_method == 'GET' and route:
+            if topic_id:
                 # Get single topic by ID
-                topic_id = path.split('/topics/')[-1]
                 return get_topic(table, topic_id)
-            elif '/topics' in path:
+            else:
                 # Get topics by subject_id or all topics
                 subject_id = query_params.get('subject_id')
                 if subject_id:
@@ -228,17 +246,15 @@ def lambda_handler(event, context):
                 else:
                     return get_all_topics(table)
         
-        elif http_method == 'POST' and '/topics' in path:
+        elif http_method == 'POST' and route:
             return create_topic(table, body)
         
-        elif http_method == 'PUT' and '/topics/' in path:
-            topic_id = path.split('/topics/')[-1]
-            print(f"DEBUG: PUT request for topic_id: {topic_id}")
+        elif http_method == 'PUT' and topic_id:
+            logger.debug("PUT request for topic_id: %s", topic_id)
             return update_topic(table, topic_id, body)
         
-        elif http_method == 'DELETE' and '/topics/' in path:
-            topic_id = path.split('/topics/')[-1]
-            print(f"DEBUG: DELETE request for topic_id: {topic_id}")
+        elif http_method == 'DELETE' and topic_id:
+            logger.debug("DELETE request for topic_id: %s", topic_id)
             return delete_topic(table, topic_id)
         
         elif path == '/extract-pdf' and http_method == 'POST':
@@ -265,7 +281,7 @@ def lambda_handler(event, context):
             }
         
         else:
-            print(f"DEBUG: No route matched - Method: {http_method}, Path: {path}")
+            logger.debug("No route matched - Method: %s, Path: %s", http_method, path)
             return {
                 'statusCode': 404,
                 'headers': {
@@ -386,7 +402,7 @@ def create_topic(table, topic_data):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps(item, cls=DecimalEncoder)
+            'body': to_json(item)
         }
     
     except Exception as e:
@@ -420,7 +436,7 @@ def get_topic(table, topic_id):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps(response['Item'], cls=DecimalEncoder)
+            'body': to_json(response['Item'])
         }
     
     except Exception as e:
@@ -441,11 +457,12 @@ def get_topics_by_subject(table, subject_id):
         # for small datasets in edge cases.
         items = []
         last_exception = None
+        key_condition = SUBJECT_KEY.eq(subject_id)
         for attempt in range(3):
             try:
                 response = table.query(
                     IndexName='school-class-subject-index',
-                    KeyConditionExpression=boto3.dynamodb.conditions.Key('subject_id').eq(subject_id)
+                    KeyConditionExpression=key_condition
                 )
                 items = response.get('Items', [])
                 if items:
@@ -460,7 +477,7 @@ def get_topics_by_subject(table, subject_id):
         if not items:
             try:
                 scan_resp = table.scan(
-                    FilterExpression=boto3.dynamodb.conditions.Attr('subject_id').eq(subject_id)
+                    FilterExpression=SUBJECT_ATTR.eq(subject_id)
                 )
                 items = scan_resp.get('Items', [])
             except Exception as e:
@@ -474,7 +491,7 @@ def get_topics_by_subject(table, subject_id):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps(items, cls=DecimalEncoder)
+            'body': to_json(items)
         }
     
     except Exception as e:
@@ -498,7 +515,7 @@ def get_all_topics(table):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps(response['Items'], cls=DecimalEncoder)
+            'body': to_json(response['Items'])
         }
     
     except Exception as e:
@@ -514,31 +531,17 @@ def get_all_topics(table):
 def update_topic(table, topic_id, update_data):
     """Update an existing topic"""
     try:
-        print(f"DEBUG: update_topic called with topic_id: {topic_id}")
-        print(f"DEBUG: update_data: {update_data}")
-        print(f"DEBUG: aiContent in update_data: {update_data.get('aiContent', 'NOT_FOUND')}")
-        if 'aiContent' in update_data:
+        logger.debug("update_topic called with topic_id: %s", topic_id)
+        logger.debug("update_data: %s", update_data)
+        if logger.isEnabledFor(logging.DEBUG) and isinstance(update_data.get('aiContent'), dict):
             ai_content = update_data['aiContent']
-            print(f"DEBUG: aiContent type: {type(ai_content)}")
-            print(f"DEBUG: aiContent keys: {list(ai_content.keys()) if isinstance(ai_content, dict) else 'Not a dict'}")
-            print(f"DEBUG: teachingGuide in aiContent: {'teachingGuide' in ai_content if isinstance(ai_content, dict) else 'N/A'}")
-            print(f"DEBUG: images in aiContent: {'images' in ai_content if isinstance(ai_content, dict) else 'N/A'}")
-        # Check if topic exists
-        existing_response = table.get_item(Key={'id': topic_id})
-        if 'Item' not in existing_response:
-            return {
-                'statusCode': 404,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Topic not found'})
-            }
-        
+            logger.debug("aiContent keys: %s", list(ai_content.keys()))
+            logger.debug("teachingGuide in aiContent: %s", 'teachingGuide' in ai_content)
+            logger.debug("images in aiContent: %s", 'images' in ai_content)
         # Document links are optional - no validation required
         
         # Prepare update expression with expression attribute names for reserved keywords
-        update_expression = "SET updated_at = :updated_at"
+        set_clauses = ["updated_at = :updated_at"]
         expression_values = {':updated_at': datetime.utcnow().isoformat()}
         expression_names = {}
         
@@ -582,16 +585,18 @@ def update_topic(table, topic_id, update_data):
                 if field in reserved_keywords:
                     attr_name = f"#{field}"
                     expression_names[attr_name] = field
-                    update_expression += f", {attr_name} = :{field}"
+                    set_clauses.append(f"{attr_name} = :{field}")
                 else:
-                    update_expression += f", {field} = :{field}"
+                    set_clauses.append(f"{field} = :{field}")
                 
                 expression_values[f':{field}'] = value
         
-        # Perform update
+        # Perform update; the condition stands in for a separate existence check,
+        # so a missing topic fails here instead of being created
         update_params = {
             'Key': {'id': topic_id},
-            'UpdateExpression': update_expression,
+            'ConditionExpression': 'attribute_exists(id)',
+            'UpdateExpression': "SET " + ", ".join(set_clauses),
             'ExpressionAttributeValues': expression_values,
             'ReturnValues': "ALL_NEW"
         }
@@ -600,7 +605,19 @@ def update_topic(table, topic_id, update_data):
         if expression_names:
             update_params['ExpressionAttributeNames'] = expression_names
         
-        response = table.update_item(**update_params)
+        try:
+            response = table.update_item(**update_params)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return {
+                    'statusCode': 404,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'error': 'Topic not found'})
+                }
+            raise
         
         return {
             'statusCode': 200,
@@ -608,7 +625,7 @@ def update_topic(table, topic_id, update_data):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps(response['Attributes'], cls=DecimalEncoder)
+            'body': to_json(response['Attributes'])
         }
     
     except Exception as e:
@@ -624,20 +641,20 @@ def update_topic(table, topic_id, update_data):
 def delete_topic(table, topic_id):
     """Delete a topic"""
     try:
-        # Check if topic exists
-        existing_response = table.get_item(Key={'id': topic_id})
-        if 'Item' not in existing_response:
-            return {
-                'statusCode': 404,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Topic not found'})
-            }
-        
-        # Delete the topic
-        table.delete_item(Key={'id': topic_id})
+        # Delete the topic; the condition reports a missing topic in the same call
+        try:
+            table.delete_item(Key={'id': topic_id}, ConditionExpression='attribute_exists(id)')
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return {
+                    'statusCode': 404,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'error': 'Topic not found'})
+                }
+            raise
         
         return {
             'statusCode': 200,
@@ -0,0 +1,45 @@
+"""
+Migrate Academic Records Table Script
+
+Brings an existing academic_records table up to the schema the Lambda
+creates for new tables:
+1. Backfill class_id on records written before it was stored
+2. Add any GSI from TABLE_SCHEMA the table lacks (e.g. topic_id-index)
+3. Report indexes whose projection lacks list-view attributes (e.g. created_at);
+   these must be deleted by hand, after which a re-run creates them again
+
+class_id is backfilled before its index is created, so by the time the
+Lambda sees class_id-index ACTIVE every record is in it.
+
+Safe to run more than once. deploy-academic-records.sh runs it after
+updating the function code; until an index is ACTIVE, the Lambda falls back
+to the query it used before that index existed.
+
+Usage:
+    python3 migrate_academic_records.py
+"""
+
+from academic_records_lambda_function import TABLE_NAME, TABLE_SCHEMA, dynamodb_client, backfill_class_ids
+from table_migrations import describe_table, add_missing_indexes, stale_projections
+
+
+def main():
+    """Run every migration step against the live table"""
+    if describe_table(dynamodb_client, TABLE_NAME) is None:
+        print(f"Table {TABLE_NAME} does not exist yet; the Lambda creates it with the current schema")
+        return
+
+    print(f"Backfilled class_id on {backfill_class_ids()} records")
+
+    added = add_missing_indexes(dynamodb_client, TABLE_SCHEMA)
+    print(f"Indexes added: {', '.join(added) if added else 'none'}")
+
+    for index_name in stale_projections(dynamodb_client, TABLE_SCHEMA):
+        print(f"WARNING: {index_name} does not project every list-view attribute. Delete it with")
+        print(f"  aws dynamodb update-table --table-name {TABLE_NAME} "
+              f"--global-secondary-index-updates '[{{\"Delete\":{{\"IndexName\":\"{index_name}\"}}}}]'")
+        print("and run this script again to recreate it.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Migrate Users Table Script
+
+Brings an existing learning_assist_users table up to the schema the auth
+Lambda creates for new tables:
+1. Add any GSI from USERS_TABLE_SCHEMA the table lacks (e.g. phone-index)
+2. Write the email marker of every user registered before markers existed,
+   so their emails cannot be registered again
+
+Safe to run more than once. deploy-auth-only.sh runs it after updating the
+function code; until an index is ACTIVE, the Lambda scans for the user
+instead.
+
+Usage:
+    python3 migrate_users_table.py
+"""
+
+from auth_lambda_function import users_table_name, USERS_TABLE_SCHEMA, dynamodb_client, backfill_email_markers
+from table_migrations import describe_table, add_missing_indexes
+
+
+def main():
+    """Run every migration step against the live table"""
+    if describe_table(dynamodb_client, users_table_name) is None:
+        print(f"Table {users_table_name} does not exist yet; the Lambda creates it with the current schema")
+        return
+
+    added = add_missing_indexes(dynamodb_client, USERS_TABLE_SCHEMA)
+    print(f"Indexes added: {', '.join(added) if added else 'none'}")
+
+    backfill_email_markers()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+DynamoDB Table Migration Helpers
+
+Shared by the migrate_*.py scripts, which bring tables created by an older
+Lambda version up to the schema the current version creates. Every step
+checks the live table first, so the scripts are safe to run more than once.
+"""
+
+import time
+from typing import Dict, Any, List, Optional
+
+# Throughput for new indexes on tables that still use provisioned billing
+PROVISIONED_INDEX_THROUGHPUT = {
+    'ReadCapacityUnits': 5,
+    'WriteCapacityUnits': 5
+}
+
+INDEX_POLL_SECONDS = 15
+
+
+def describe_table(client, table_name: str) -> Optional[Dict[str, Any]]:
+    """Return the table description, or None if the table does not exist yet"""
+    try:
+        return client.describe_table(TableName=table_name)['Table']
+    except client.exceptions.ResourceNotFoundException:
+        return None
+
+
+def wait_until_active(client, table_name: str, index_name: str) -> None:
+    """Block until the table and the named GSI are both ACTIVE"""
+    while True:
+        table = describe_table(client, table_name)
+        indexes = {index['IndexName']: index for index in table.get('GlobalSecondaryIndexes', [])}
+        if table['TableStatus'] == 'ACTIVE' and indexes[index_name]['IndexStatus'] == 'ACTIVE':
+            return
+        print(f"  {index_name}: {indexes[index_name]['IndexStatus']}, waiting...")
+        time.sleep(INDEX_POLL_SECONDS)
+
+
+def add_missing_indexes(client, schema: Dict[str, Any]) -> List[str]:
+    """Create each GSI in a create_table schema that the live table lacks.
+
+    DynamoDB takes one new index per UpdateTable call, so indexes are added one
+    at a time and each is waited on until ACTIVE. Returns the names added.
+    """
+    table_name = schema['TableName']
+    table = describe_table(client, table_name)
+    existing = {index['IndexName'] for index in table.get('GlobalSecondaryIndexes', [])}
+    provisioned = table.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED') == 'PROVISIONED'
+
+    added = []
+    for index in schema['GlobalSecondaryIndexes']:
+        if index['IndexName'] in existing:
+            # An index created by an earlier run may still be backfilling
+            wait_until_active(client, table_name, index['IndexName'])
+            continue
+
+        create = {key: value for key, value in index.items() if key != 'ProvisionedThroughput'}
+        if provisioned:
+            create['ProvisionedThroughput'] = index.get('ProvisionedThroughput', PROVISIONED_INDEX_THROUGHPUT)
+        key_names = {key['AttributeName'] for key in index['KeySchema']}
+
+        print(f"Creating {index['IndexName']} on {table_name}...")
+        client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=[
+                definition for definition in schema['AttributeDefinitions']
+                if definition['AttributeName'] in key_names
+            ],
+            GlobalSecondaryIndexUpdates=[{'Create': create}]
+        )
+        wait_until_active(client, table_name, index['IndexName'])
+        added.append(index['IndexName'])
+
+    return added
+
+
+def stale_projections(client, schema: Dict[str, Any]) -> List[str]:
+    """Name the live INCLUDE indexes that project fewer attributes than the schema.
+
+    A GSI's projection cannot be changed in place; such an index has to be
+    deleted and then created again (add_missing_indexes does the latter).
+    """
+    table = describe_table(client, schema['TableName'])
+    live = {index['IndexName']: index['Projection'] for index in table.get('GlobalSecondaryIndexes', [])}
+    stale = []
+    for index in schema['GlobalSecondaryIndexes']:
+        projection = live.get(index['IndexName'])
+        if projection is None or projection['ProjectionType'] == 'ALL':
+            continue
+        wanted = set(index['Projection'].get('NonKeyAttributes', []))
+        if not wanted <= set(projection.get('NonKeyAttributes', [])):
+            stale.append(index['IndexName'])
+    return stale
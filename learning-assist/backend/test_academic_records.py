@@ -5,16 +5,20 @@ Run this locally to test the Lambda function logic
 """
 
 import json
+import os
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
 from academic_records_lambda_function import (
     create_academic_record,
     get_academic_record,
     update_academic_record,
     delete_academic_record,
-    query_by_parent_phone,
     query_by_teacher_id,
     query_by_school_id,
     list_records_by_class,
-    generate_record_id
+    generate_record_id,
+    parse_batch_keys
 )
 
 
@@ -87,6 +91,36 @@ def test_invalid_status():
     print("✓ Validation logic is in place")
 
 
+def test_parse_batch_keys():
+    """Test validation and de-duplication of batch get keys"""
+    print("\n=== Test: Parse Batch Keys ===")
+    
+    key = {"record_id": "content-development-school#2024-25#6#A#science", "topic_id": "topic-photosynthesis"}
+    other = {"record_id": key["record_id"], "topic_id": "topic-respiration"}
+    
+    # Repeated keys are read once; extra attributes are dropped
+    keys = parse_batch_keys(json.dumps([key, dict(key, status="completed"), other]))
+    assert keys == [key, other]
+    
+    malformed = [
+        None,                                       # missing parameter
+        "[]",                                       # empty array
+        "not json",
+        json.dumps(key),                            # object, not an array
+        json.dumps([key, "topic-respiration"]),     # non-object key
+        json.dumps([{"record_id": key["record_id"]}]),
+        json.dumps([{"record_id": key["record_id"], "topic_id": ""}]),
+        json.dumps([{"record_id": 6, "topic_id": "topic-photosynthesis"}])
+    ]
+    for keys_param in malformed:
+        try:
+            parse_batch_keys(keys_param)
+            assert False, f"Accepted malformed keys: {keys_param}"
+        except ValueError:
+            pass
+    print("✓ Test passed")
+
+
 def print_api_examples():
     """Print cURL examples for testing"""
     print("\n" + "="*60)
@@ -218,6 +252,7 @@ def main():
     test_generate_record_id()
     test_create_record()
     test_invalid_status()
+    test_parse_batch_keys()
     
     # Print reference information
     print_data_model()
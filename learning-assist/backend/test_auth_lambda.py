@@ -0,0 +1,189 @@
+"""
+Test script for the Auth Lambda Function
+
+Run this locally to test the Lambda function logic. DynamoDB calls are
+answered by botocore's Stubber, so no AWS access is needed.
+"""
+
+import base64
+import hashlib
+import os
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber, ANY
+import auth_lambda_function
+from auth_lambda_function import (
+    users_table,
+    dynamodb_client,
+    CURRENT_KDF,
+    KDF_PBKDF2,
+    hash_password,
+    verify_password,
+    login_user,
+    build_user_item,
+    save_new_user,
+    register_users_batch
+)
+
+TEST_USER = {
+    'email': 'Teacher@Example.com',
+    'password': 'correct horse',
+    'name': 'Mrs. Smith',
+    'user_type': 'teacher'
+}
+
+
+def cancellation(*codes):
+    """Stub kwargs for a TransactionCanceledException with one reason per item"""
+    return {
+        'service_error_code': 'TransactionCanceledException',
+        'service_message': 'Transaction cancelled',
+        'modeled_fields': {'CancellationReasons': [{'Code': code} for code in codes]}
+    }
+
+
+def test_save_new_user_maps_cancellation_reasons():
+    """Only a failed email-marker condition means the email is taken"""
+    print("\n=== Test: save_new_user cancellation reasons ===")
+    item = build_user_item(TEST_USER, b'hash', b'salt', '2024-09-29T12:00:00')
+
+    with Stubber(users_table.meta.client) as stubber:
+        stubber.add_response('transact_write_items', {})
+        stubber.add_client_error('transact_write_items', **cancellation('None', 'ConditionalCheckFailed'))
+        stubber.add_client_error('transact_write_items', **cancellation('None', 'TransactionConflict'))
+        stubber.add_client_error('transact_write_items', **cancellation('ThrottlingError', 'None'))
+
+        assert save_new_user(users_table, item) is True
+        assert save_new_user(users_table, item) is False
+        for _ in range(2):
+            try:
+                save_new_user(users_table, item)
+                assert False, "Cancellation was not re-raised"
+            except ClientError as e:
+                assert e.response['Error']['Code'] == 'TransactionCanceledException'
+    print("✓ Test passed")
+
+
+def test_batch_registration_rejects_duplicate_emails():
+    """Repeated and already registered emails are reported per row"""
+    print("\n=== Test: Batch registration duplicate emails ===")
+    users = [
+        TEST_USER,
+        dict(TEST_USER, email=' teacher@example.com'),   # repeats row 0
+        dict(TEST_USER, email='registered@example.com')  # already registered
+    ]
+
+    saved = (auth_lambda_function.verify_jwt_token,
+             auth_lambda_function.get_user_profile,
+             auth_lambda_function.hash_password)
+    auth_lambda_function.verify_jwt_token = lambda token: {'valid': True, 'user': {'user_id': 'admin-1'}}
+    auth_lambda_function.get_user_profile = lambda user_id: {'user_type': 'admin'}
+    auth_lambda_function.hash_password = lambda password: (b'hash', b'salt')
+    try:
+        event = {'headers': {'Authorization': 'Bearer token'}}
+        with Stubber(users_table.meta.client) as stubber:
+            # Rows 0 and 2 are saved concurrently; stub both as already registered
+            stubber.add_client_error('transact_write_items', **cancellation('None', 'ConditionalCheckFailed'))
+            stubber.add_client_error('transact_write_items', **cancellation('None', 'ConditionalCheckFailed'))
+            response = register_users_batch(users_table, {'users': users}, event)
+            stubber.assert_no_pending_responses()
+
+        body = auth_lambda_function.from_json(response['body'])
+        assert response['statusCode'] == 409
+        assert body['users'] == []
+        assert [row['index'] for row in body['rejected']] == [0, 1, 2]
+        assert body['rejected'][1]['error'] == 'Duplicate email in batch'
+        assert body['rejected'][2]['error'] == 'User with this email already exists'
+
+        with Stubber(users_table.meta.client) as stubber:
+            stubber.add_response('transact_write_items', {})
+            response = register_users_batch(users_table, {'users': users[:2]}, event)
+        assert response['statusCode'] == 207
+        body = auth_lambda_function.from_json(response['body'])
+        assert [user['email'] for user in body['users']] == ['teacher@example.com']
+        assert body['rejected'] == [{'index': 1, 'email': 'teacher@example.com', 'error': 'Duplicate email in batch'}]
+    finally:
+        (auth_lambda_function.verify_jwt_token,
+         auth_lambda_function.get_user_profile,
+         auth_lambda_function.hash_password) = saved
+    print("✓ Test passed")
+
+
+def legacy_hash(password):
+    """A hash as the original register_user stored it: base64 PBKDF2 digest
+    and base64 salt text, where the text itself was used as the salt"""
+    salt_text = base64.b64encode(os.urandom(32)).decode('utf-8')
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt_text.encode('utf-8'), 100000)
+    return base64.b64encode(digest).decode('utf-8'), salt_text
+
+
+def test_verify_password_accepts_legacy_hashes():
+    """String hashes from before binary storage, and untagged PBKDF2 hashes, still verify"""
+    print("\n=== Test: verify_password legacy hashes ===")
+    stored_hash, salt = legacy_hash('legacy password')
+    assert verify_password('legacy password', stored_hash, salt)
+    assert not verify_password('wrong password', stored_hash, salt)
+    
+    stored_hash, salt = hash_password('pbkdf2 password', kdf=KDF_PBKDF2)
+    assert verify_password('pbkdf2 password', stored_hash, salt)
+    assert not verify_password('wrong password', stored_hash, salt)
+    
+    stored_hash, salt = hash_password('scrypt password')
+    assert verify_password('scrypt password', stored_hash, salt, CURRENT_KDF)
+    assert not verify_password('wrong password', stored_hash, salt, CURRENT_KDF)
+    print("✓ Test passed")
+
+
+def test_login_rehashes_legacy_password():
+    """A successful login with a legacy hash stores a current-KDF hash with last_login"""
+    print("\n=== Test: Login rehashes legacy password ===")
+    stored_hash, salt = legacy_hash('rehash password')
+    
+    saved = auth_lambda_function.active_indexes
+    auth_lambda_function.active_indexes = frozenset({'email-index'})
+    try:
+        with Stubber(dynamodb_client) as query_stubber, Stubber(users_table.meta.client) as update_stubber:
+            query_stubber.add_response('query', {'Items': [{
+                'user_id': {'S': 'user-123'},
+                'email': {'S': 'parent@example.com'},
+                'name': {'S': 'Parent'},
+                'user_type': {'S': 'parent'},
+                'password_hash': {'S': stored_hash},
+                'salt': {'S': salt}
+            }]})
+            update_stubber.add_response('update_item', {}, {
+                'TableName': users_table.name,
+                'Key': {'user_id': 'user-123'},
+                'UpdateExpression': 'SET last_login = :login_time, password_hash = :hash, salt = :salt, kdf = :kdf',
+                'ConditionExpression': 'attribute_exists(user_id)',
+                'ExpressionAttributeValues': {':login_time': ANY, ':hash': ANY, ':salt': ANY, ':kdf': CURRENT_KDF},
+                'ReturnValues': 'NONE'
+            })
+            response = login_user(users_table, {'email': 'parent@example.com', 'password': 'rehash password'})
+            update_stubber.assert_no_pending_responses()
+        assert response['statusCode'] == 200
+    finally:
+        auth_lambda_function.active_indexes = saved
+    print("✓ Test passed")
+
+
+def main():
+    """Run all tests"""
+    print("="*60)
+    print("Auth Lambda Function - Test Suite")
+    print("="*60)
+
+    test_save_new_user_maps_cancellation_reasons()
+    test_batch_registration_rejects_duplicate_emails()
+    test_verify_password_accepts_legacy_hashes()
+    test_login_rehashes_legacy_password()
+
+    print("\n" + "="*60)
+    print("Test Suite Complete")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
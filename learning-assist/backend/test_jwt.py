@@ -34,3 +34,99 @@ try:
     print("✅ JWT decode successful:", decoded)
 except Exception as e:
     print("❌ JWT functionality test failed:", e)
+
+
+# --- HS256Codec (auth Lambda's fallback when PyJWT is not packaged) ---
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from datetime import datetime, timedelta
+import jwt
+from auth_lambda_function import (
+    HS256Codec,
+    TokenExpiredError,
+    TOKEN_SECRET,
+    generate_jwt_token
+)
+import auth_lambda_function
+
+TEST_USER = {'user_id': 'user-123', 'user_type': 'teacher'}
+
+
+def tamper(token):
+    """Swap the payload segment for one claiming a different user"""
+    header, _, signature = token.split('.')
+    payload = jwt.utils.base64url_encode(b'{"sub":"admin-1","ut":"admin","exp":9999999999}').decode('ascii')
+    return f"{header}.{payload}.{signature}"
+
+
+def test_codec_matches_pyjwt_for_valid_token():
+    """HS256Codec decodes our tokens exactly as PyJWT does"""
+    print("\n=== Test: HS256Codec valid token ===")
+    token = generate_jwt_token(TEST_USER)
+    expected = jwt.decode(token, TOKEN_SECRET, algorithms=['HS256'])
+    assert HS256Codec().decode(token, TOKEN_SECRET) == expected
+    
+    # Tokens signed by PyJWT itself verify too
+    token = jwt.encode({'sub': 'user-123', 'exp': 9999999999}, TOKEN_SECRET, algorithm='HS256')
+    assert HS256Codec().decode(token, TOKEN_SECRET)['sub'] == 'user-123'
+    print("✓ Test passed")
+
+
+def test_codec_rejects_expired_token():
+    """Both codecs treat an expired token as expired"""
+    print("\n=== Test: HS256Codec expired token ===")
+    token = generate_jwt_token(TEST_USER, datetime.utcnow() - timedelta(days=8))
+    
+    try:
+        jwt.decode(token, TOKEN_SECRET, algorithms=['HS256'])
+        assert False, "PyJWT accepted an expired token"
+    except jwt.ExpiredSignatureError:
+        pass
+    try:
+        HS256Codec().decode(token, TOKEN_SECRET)
+        assert False, "HS256Codec accepted an expired token"
+    except TokenExpiredError:
+        pass
+    print("✓ Test passed")
+
+
+def test_codec_rejects_tampered_token():
+    """Both codecs reject a payload that does not match the signature"""
+    print("\n=== Test: HS256Codec tampered token ===")
+    token = tamper(generate_jwt_token(TEST_USER))
+    
+    try:
+        jwt.decode(token, TOKEN_SECRET, algorithms=['HS256'])
+        assert False, "PyJWT accepted a tampered token"
+    except jwt.InvalidSignatureError:
+        pass
+    try:
+        HS256Codec().decode(token, TOKEN_SECRET)
+        assert False, "HS256Codec accepted a tampered token"
+    except ValueError:
+        pass
+    print("✓ Test passed")
+
+
+def test_verify_reports_expiry_with_fallback_codec():
+    """verify_jwt_token catches the fallback codec's own expiry error"""
+    print("\n=== Test: verify_jwt_token with HS256Codec ===")
+    saved = auth_lambda_function.jwt_codec
+    auth_lambda_function.jwt_codec = (HS256Codec(), TokenExpiredError)
+    try:
+        token = generate_jwt_token(TEST_USER, datetime.utcnow() - timedelta(days=8))
+        assert auth_lambda_function.verify_jwt_token(token) == {'valid': False, 'error': 'Token has expired'}
+        
+        result = auth_lambda_function.verify_jwt_token(generate_jwt_token(TEST_USER))
+        assert result['valid'] and result['user']['user_id'] == 'user-123'
+    finally:
+        auth_lambda_function.jwt_codec = saved
+    print("✓ Test passed")
+
+
+if __name__ == "__main__":
+    test_codec_matches_pyjwt_for_valid_token()
+    test_codec_rejects_expired_token()
+    test_codec_rejects_tampered_token()
+    test_verify_reports_expiry_with_fallback_codec()